@@ -0,0 +1,133 @@
+"""
+Admission Control for Horizn Backend
+Concurrency limits with bounded queues and fast load shedding for CPU-bound work
+"""
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+BCRYPT_MAX_CONCURRENCY = int(os.getenv("BCRYPT_MAX_CONCURRENCY", str(os.cpu_count() or 2)))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "64"))
+BCRYPT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BCRYPT_QUEUE_TIMEOUT_SECONDS", "2.0"))
+USER_IMPORT_MAX_CONCURRENCY = int(os.getenv("USER_IMPORT_MAX_CONCURRENCY", "1"))
+USER_IMPORT_MAX_QUEUE = int(os.getenv("USER_IMPORT_MAX_QUEUE", "1"))
+USER_IMPORT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("USER_IMPORT_QUEUE_TIMEOUT_SECONDS", "1.0"))
+
+# Non-standard status used by nginx for "client closed request"; never seen by the client
+CLIENT_CLOSED_REQUEST = 499
+
+
+class AdmissionController:
+    """
+    Caps how many requests run a section at once and how many may wait.
+
+    A request that finds the wait queue full, or waits longer than
+    ``queue_timeout``, is rejected immediately with 503 and a Retry-After
+    estimated from recent service times, instead of queueing inside the
+    server until the client has given up. A request whose client
+    disconnected while it waited is dropped before doing any work.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._service_time = 0.25  # EWMA of seconds per admitted request
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.cancelled_disconnected = 0
+
+    @asynccontextmanager
+    async def slot(self, request: Request) -> AsyncIterator[None]:
+        """
+        Hold one concurrency slot for the duration of the block.
+
+        Raises:
+            HTTPException: 503 when shed, 499 when the client went away
+        """
+        if self.waiting >= self.max_queue:
+            self.shed_queue_full += 1
+            raise self._overloaded()
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed_timeout += 1
+            raise self._overloaded()
+        finally:
+            self.waiting -= 1
+
+        started = time.monotonic()
+        try:
+            if await request.is_disconnected():
+                self.cancelled_disconnected += 1
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected")
+
+            self.active += 1
+            self.admitted += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+                elapsed = time.monotonic() - started
+                self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+        finally:
+            self._semaphore.release()
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue would likely drain"""
+        backlog = self.waiting + self.active
+        return max(1, math.ceil(backlog * self._service_time / self.max_concurrency))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "cancelled_disconnected": self.cancelled_disconnected,
+            "avg_service_seconds": round(self._service_time, 4),
+        }
+
+    def _overloaded(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(self.retry_after())}
+        )
+
+
+# Limits bcrypt hashing/verification (login, register, reset_password)
+bcrypt_admission = AdmissionController(
+    "bcrypt",
+    max_concurrency=BCRYPT_MAX_CONCURRENCY,
+    max_queue=BCRYPT_MAX_QUEUE,
+    queue_timeout=BCRYPT_QUEUE_TIMEOUT_SECONDS
+)
+
+# Limits bulk user imports run by the API server (each one hashes on the shared import pool)
+import_admission = AdmissionController(
+    "user_import",
+    max_concurrency=USER_IMPORT_MAX_CONCURRENCY,
+    max_queue=USER_IMPORT_MAX_QUEUE,
+    queue_timeout=USER_IMPORT_QUEUE_TIMEOUT_SECONDS
+)
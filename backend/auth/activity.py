@@ -0,0 +1,138 @@
+"""
+Activity Tracking for Horizn Backend
+Write-behind buffer for last_login_at / last_seen_at
+"""
+import asyncio
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, func, update
+
+from database import SessionLocal, group_by_user_shard
+from models import User
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+ACTIVITY_FLUSH_INTERVAL_SECONDS = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_SECONDS", "30"))
+
+users_table = User.__table__
+
+# One statement for every pending user. A NULL bind leaves the column as is,
+# and updated_at is set to itself so activity doesn't count as a profile edit.
+ACTIVITY_UPDATE = (
+    update(users_table)
+    .where(users_table.c.id == bindparam("user_id"))
+    .values(
+        last_login_at=func.coalesce(bindparam("login_at"), users_table.c.last_login_at),
+        last_seen_at=func.coalesce(bindparam("seen_at"), users_table.c.last_seen_at),
+        updated_at=users_table.c.updated_at
+    )
+)
+
+
+class ActivityTracker:
+    """
+    Coalesces per-user activity in memory and writes it in bulk.
+
+    Recording is a dict assignment, so authenticated requests do no extra
+    I/O; however many requests a user makes between flushes, the flush
+    writes one row for them.
+    """
+
+    def __init__(self, flush_interval: float = ACTIVITY_FLUSH_INTERVAL_SECONDS):
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, Dict[str, Optional[datetime]]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.rows_written = 0
+        self.flushes = 0
+
+    def record_login(self, user_id: int) -> None:
+        """Note a successful login (also counts as seen)"""
+        now = datetime.utcnow()
+        with self._lock:
+            self._pending[user_id] = {"login_at": now, "seen_at": now}
+
+    def record_seen(self, user_id: int) -> None:
+        """Note an authenticated request"""
+        now = datetime.utcnow()
+        with self._lock:
+            entry = self._pending.get(user_id)
+            if entry is None:
+                self._pending[user_id] = {"login_at": None, "seen_at": now}
+            else:
+                entry["seen_at"] = now
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def start(self) -> None:
+        """Start the periodic flusher (call from the running event loop)"""
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write whatever is pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await asyncio.to_thread(self.flush)
+
+    def flush(self) -> int:
+        """
+        Write all pending activity as one executemany UPDATE.
+
+        Returns:
+            Number of users written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        rows: List[dict] = [
+            {"user_id": user_id, "login_at": entry["login_at"], "seen_at": entry["seen_at"]}
+            for user_id, entry in pending.items()
+        ]
+        db = SessionLocal()
+        try:
+            for bind_arguments, shard_rows in group_by_user_shard(rows):
+                db.execute(ACTIVITY_UPDATE, shard_rows, bind_arguments=bind_arguments)
+            db.commit()
+            self.rows_written += len(rows)
+            self.flushes += 1
+        except Exception as e:
+            db.rollback()
+            print(f"❌ [ACTIVITY] Failed to write activity for {len(rows)} users: {type(e).__name__}: {e}")
+            self._requeue(pending)
+            return 0
+        finally:
+            db.close()
+        return len(rows)
+
+    def _requeue(self, pending: Dict[int, Dict[str, Optional[datetime]]]) -> None:
+        """Put a failed batch back without overwriting newer activity"""
+        with self._lock:
+            for user_id, entry in pending.items():
+                newer = self._pending.get(user_id)
+                if newer is None:
+                    self._pending[user_id] = entry
+                elif newer["login_at"] is None:
+                    newer["login_at"] = entry["login_at"]
+
+
+# Process-wide tracker, started in the application lifespan
+activity_tracker = ActivityTracker()
@@ -0,0 +1,152 @@
+"""
+Known-Email Filter for Horizn Backend
+Bloom filter of registered emails so lookups for unknown emails skip the database
+"""
+import hashlib
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from models import User
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+EMAIL_FILTER_FP_RATE = float(os.getenv("EMAIL_FILTER_FP_RATE", "0.01"))
+EMAIL_FILTER_SYNC_SECONDS = float(os.getenv("EMAIL_FILTER_SYNC_SECONDS", "1.0"))
+EMAIL_FILTER_MIN_CAPACITY = 10000
+
+# Ids can commit out of order across workers, so catch-up re-reads a few below the max
+CATCH_UP_ID_MARGIN = 100
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on SHA-256)"""
+
+    def __init__(self, capacity: int, fp_rate: float = EMAIL_FILTER_FP_RATE):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.sha256(value.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value: str) -> None:
+        if value in self:
+            return
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class EmailFilter:
+    """
+    Bloom filter of normalized emails, rebuilt at startup.
+
+    A negative answer means the email is not registered, so callers can
+    skip the query. Other workers may have registered emails this process
+    hasn't seen, so on a miss the filter first catches up on users with
+    ids above the highest one it knows (an index range scan that almost
+    always returns nothing), at most once per EMAIL_FILTER_SYNC_SECONDS.
+    """
+
+    def __init__(self):
+        self._filter: Optional[BloomFilter] = None
+        self._max_user_id = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def rebuild(self, db: Session) -> int:
+        """
+        Load every normalized email into a freshly sized filter.
+
+        Returns:
+            Number of emails loaded
+        """
+        # One count per shard when users are sharded
+        total = sum(count for (count,) in db.query(func.count(User.id)).all())
+        bloom = BloomFilter(max(EMAIL_FILTER_MIN_CAPACITY, total * 2))
+        max_user_id = 0
+        rows = db.query(User.id, User.email_normalized).filter(
+            User.email_normalized.isnot(None)
+        ).yield_per(5000)
+        for user_id, email in rows:
+            bloom.add(email)
+            max_user_id = max(max_user_id, user_id)
+
+        with self._lock:
+            self._filter = bloom
+            self._max_user_id = max_user_id
+            self._synced_at = time.monotonic()
+        return bloom.count
+
+    def add(self, email_normalized: str, user_id: Optional[int] = None) -> None:
+        """Record a newly inserted user"""
+        if self._filter is None:
+            return
+        with self._lock:
+            self._filter.add(email_normalized)
+            if user_id is not None:
+                self._max_user_id = max(self._max_user_id, user_id)
+
+    def might_exist(self, db: Session, email_normalized: str) -> bool:
+        """
+        False only if no user has this email (as of the last sync).
+        Always True before the filter has been built.
+        """
+        bloom = self._filter
+        if bloom is None or email_normalized in bloom:
+            return True
+
+        if time.monotonic() - self._synced_at < EMAIL_FILTER_SYNC_SECONDS:
+            return False
+
+        self._catch_up(db)
+        return email_normalized in self._filter
+
+    def _catch_up(self, db: Session) -> None:
+        """Add users inserted (by any worker) since the last sync"""
+        rows = db.query(User.id, User.email_normalized).filter(
+            User.id > self._max_user_id - CATCH_UP_ID_MARGIN,
+            User.email_normalized.isnot(None)
+        ).all()
+        with self._lock:
+            for user_id, email in rows:
+                self._filter.add(email)
+                self._max_user_id = max(self._max_user_id, user_id)
+            self._synced_at = time.monotonic()
+
+        # Past capacity the false positive rate climbs; resize
+        if self._filter.count > self._filter.capacity:
+            self.rebuild(db)
+
+
+# Process-wide filter, rebuilt in the application lifespan
+email_filter = EmailFilter()
+
+
+@event.listens_for(User, "after_insert")
+def _add_inserted_user(mapper, connection, target: User) -> None:
+    """Keep the filter current for users inserted through the ORM"""
+    if target.email_normalized:
+        email_filter.add(target.email_normalized, target.id)
@@ -0,0 +1,220 @@
+"""
+JWT Signing Key Ring for Horizn Backend
+Asymmetric (ES256 by default) keys with kid-based rotation and JWKS export
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from dotenv import load_dotenv
+from jose import jwk
+from jose.backends.base import Key
+
+# Load environment variables
+load_dotenv()
+
+# EC curve each supported signing algorithm uses
+ALGORITHM_CURVES = {
+    "ES256": ec.SECP256R1,
+    "ES384": ec.SECP384R1,
+    "ES512": ec.SECP521R1,
+}
+
+# Configuration (JWT_ALGORITHM, not the old shared-secret ALGORITHM variable)
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "ES256")
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+JWT_KEYS_RELOAD_SECONDS = int(os.getenv("JWT_KEYS_RELOAD_SECONDS", "60"))
+# Worker processes per instance (uvicorn/gunicorn --workers); each one needs the same keys
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+if JWT_ALGORITHM not in ALGORITHM_CURVES:
+    raise RuntimeError(
+        f"JWT_ALGORITHM={JWT_ALGORITHM} is not supported; "
+        f"tokens are signed with EC keys, use one of {', '.join(ALGORITHM_CURVES)}"
+    )
+if os.getenv("ALGORITHM") and os.getenv("ALGORITHM") != JWT_ALGORITHM:
+    print(f"⚠️  ALGORITHM={os.getenv('ALGORITHM')} is ignored; tokens are signed with JWT_ALGORITHM={JWT_ALGORITHM}")
+
+
+class SigningKey:
+    """A single private key with its kid and pre-built jose key objects"""
+
+    def __init__(self, kid: str, private_pem: bytes):
+        """
+        Raises:
+            ValueError: If the PEM is not an EC private key on JWT_ALGORITHM's curve
+        """
+        private_key = serialization.load_pem_private_key(private_pem, password=None)
+        curve = ALGORITHM_CURVES[JWT_ALGORITHM]
+        if not isinstance(private_key, ec.EllipticCurvePrivateKey) or not isinstance(private_key.curve, curve):
+            raise ValueError(f"Signing key '{kid}' is not an EC {curve.name} private key, as {JWT_ALGORITHM} requires")
+
+        self.kid = kid
+        self.signer: Key = jwk.construct(private_pem, JWT_ALGORITHM)
+        self.verifier: Key = self.signer.public_key()
+
+    def to_jwk(self) -> dict:
+        """Public half of the key as a JWK dict"""
+        data = self.verifier.to_dict()
+        data.update({"kid": self.kid, "use": "sig", "alg": JWT_ALGORITHM})
+        return data
+
+
+class KeyRing:
+    """
+    Set of signing keys loaded from a directory of PEM files.
+
+    Each ``<kid>.pem`` file holds one EC private key on JWT_ALGORITHM's
+    curve (P-256 for the default ES256). The active key
+    (``JWT_ACTIVE_KID``, or the last kid in sort order) signs new tokens;
+    every key in the ring verifies. To rotate, drop a new key into the
+    directory and promote it, then delete the old file once all tokens
+    signed with it have expired.
+    """
+
+    def __init__(self, keys_dir: Optional[str] = None, active_kid: Optional[str] = None):
+        self.keys_dir = keys_dir
+        self.active_kid = active_kid
+        self._keys: Dict[str, SigningKey] = {}
+        self._active: Optional[SigningKey] = None
+        self._jwks: dict = {"keys": []}
+        self._jwks_body = b""
+        self._jwks_etag = ""
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Load (or reload) every key in the keys directory"""
+        keys: Dict[str, SigningKey] = {}
+
+        if self.keys_dir and os.path.isdir(self.keys_dir):
+            for filename in sorted(os.listdir(self.keys_dir)):
+                if not filename.endswith(".pem"):
+                    continue
+                kid = filename[:-len(".pem")]
+                with open(os.path.join(self.keys_dir, filename), "rb") as f:
+                    try:
+                        keys[kid] = SigningKey(kid, f.read())
+                    except ValueError as e:
+                        if not self._keys:
+                            raise  # Refuse to start with a bad key
+                        print(f"❌ [AUTH] Skipping {filename} on reload: {e}")
+
+        if not keys:
+            if self._keys:
+                # Keep the keys we already have rather than invalidating every token
+                return
+            # Development fallback: an in-memory key that only lives as long as this
+            # process, so tokens from one worker would fail on every other one
+            if WEB_CONCURRENCY > 1:
+                raise RuntimeError(
+                    f"No signing keys in JWT_KEYS_DIR ({self.keys_dir}) and WEB_CONCURRENCY={WEB_CONCURRENCY}: "
+                    "generate one with `python -m auth.keys generate` so all workers share it"
+                )
+            kid = f"dev-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}"
+            keys[kid] = SigningKey(kid, generate_private_key_pem())
+            print(
+                f"⚠️  [DEV] No JWT_KEYS_DIR keys found, using ephemeral signing key '{kid}'. "
+                "Tokens stop validating on restart and are not accepted by other workers or instances."
+            )
+
+        active_kid = self.active_kid if self.active_kid in keys else sorted(keys)[-1]
+        jwks = {"keys": [key.to_jwk() for key in keys.values()]}
+        jwks_body = json.dumps(jwks, separators=(",", ":")).encode()
+
+        with self._lock:
+            self._keys = keys
+            self._active = keys[active_kid]
+            self._jwks = jwks
+            self._jwks_body = jwks_body
+            self._jwks_etag = f'"{hashlib.sha256(jwks_body).hexdigest()[:32]}"'
+            self._loaded_at = time.monotonic()
+
+    @property
+    def active(self) -> SigningKey:
+        """Key used to sign new tokens"""
+        if self._active is None:
+            self.load()
+        return self._active
+
+    def get(self, kid: str) -> Optional[SigningKey]:
+        """
+        Look up a verification key by kid.
+
+        An unknown kid triggers a directory reload (at most once per
+        ``JWT_KEYS_RELOAD_SECONDS``) so keys added by a rotation on another
+        instance are picked up without a restart.
+        """
+        key = self._keys.get(kid)
+        if key is None and time.monotonic() - self._loaded_at >= JWT_KEYS_RELOAD_SECONDS:
+            self.load()
+            key = self._keys.get(kid)
+        return key
+
+    def jwks(self) -> dict:
+        """Public keys as a JWK Set (RFC 7517)"""
+        if self._active is None:
+            self.load()
+        return self._jwks
+
+    def jwks_document(self) -> Tuple[bytes, str]:
+        """Pre-serialized JWK Set body and its ETag, rebuilt only on reload"""
+        if self._active is None:
+            self.load()
+        return self._jwks_body, self._jwks_etag
+
+
+def generate_private_key_pem() -> bytes:
+    """Generate a new EC private key for JWT_ALGORITHM in PKCS#8 PEM format"""
+    private_key = ec.generate_private_key(ALGORITHM_CURVES[JWT_ALGORITHM]())
+    return private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()
+    )
+
+
+# Process-wide key ring, loaded at startup
+key_ring = KeyRing(JWT_KEYS_DIR, JWT_ACTIVE_KID)
+
+
+def main():
+    """CLI for generating keys and printing the JWK Set"""
+    parser = argparse.ArgumentParser(description="Manage Horizn JWT signing keys")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Generate a new signing key")
+    generate.add_argument("--dir", default=JWT_KEYS_DIR or "keys", help="Keys directory")
+    generate.add_argument("--kid", default=None, help="Key ID (defaults to a timestamp)")
+
+    show = subparsers.add_parser("jwks", help="Print the public JWK Set")
+    show.add_argument("--dir", default=JWT_KEYS_DIR or "keys", help="Keys directory")
+
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        kid = args.kid or datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        os.makedirs(args.dir, exist_ok=True)
+        path = os.path.join(args.dir, f"{kid}.pem")
+        if os.path.exists(path):
+            parser.error(f"Key already exists: {path}")
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(generate_private_key_pem())
+        print(f"✅ Generated signing key '{kid}' at {path}")
+    elif args.command == "jwks":
+        ring = KeyRing(args.dir)
+        ring.load()
+        print(json.dumps(ring.jwks(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
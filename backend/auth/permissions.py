@@ -0,0 +1,190 @@
+"""
+Permission Checks for Horizn Backend
+Cached per-user permission flags and role dependencies
+"""
+import hmac
+import os
+from typing import Iterable, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+from cache import TTLCache
+from database import get_db
+from models import User
+from auth.utils import decode_token, http_bearer
+from auth.activity import activity_tracker
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+PERMISSION_CACHE_TTL_SECONDS = int(os.getenv("PERMISSION_CACHE_TTL_SECONDS", "300"))
+ADMIN_EMAILS = {
+    email.strip().lower()
+    for email in os.getenv("ADMIN_EMAILS", "").split(",")
+    if email.strip()
+}
+# Shared secrets for service-to-service calls (X-Internal-Token header)
+INTERNAL_SERVICE_TOKENS = [
+    token.strip()
+    for token in os.getenv("INTERNAL_SERVICE_TOKENS", "").split(",")
+    if token.strip()
+]
+# Shared secrets delivery bots stream telemetry with (X-Bot-Token header)
+BOT_TOKENS = [
+    token.strip()
+    for token in os.getenv("BOT_TOKENS", "").split(",")
+    if token.strip()
+]
+
+
+class UserPermissions(NamedTuple):
+    """Authorization-relevant flags for a user"""
+    user_id: int
+    is_active: bool
+    is_sender: bool
+    is_admin: bool
+
+
+# user_id -> UserPermissions
+permission_cache = TTLCache(maxsize=50000, ttl=PERMISSION_CACHE_TTL_SECONDS)
+
+
+def get_user_permissions(db: Session, user_id: int) -> Optional[UserPermissions]:
+    """
+    Load a user's permission flags, served from the cache when possible.
+
+    Returns:
+        UserPermissions or None if the user does not exist
+    """
+    permissions = permission_cache.get(user_id)
+    if permissions is not None:
+        return permissions
+
+    row = db.query(User.email, User.is_active, User.is_sender).filter(User.id == user_id).first()
+    if row is None:
+        return None
+
+    permissions = UserPermissions(
+        user_id=user_id,
+        is_active=bool(row.is_active),
+        is_sender=bool(row.is_sender),
+        is_admin=is_admin_email(row.email)
+    )
+    permission_cache.set(user_id, permissions)
+    return permissions
+
+
+def invalidate_user_permissions(user_ids: Iterable[int]) -> None:
+    """Drop cached permissions after a role change"""
+    permission_cache.invalidate_many(user_ids)
+
+
+def token_matches(token: Optional[str], known_tokens: Iterable[str]) -> bool:
+    """Constant-time check of a presented shared secret against a configured list"""
+    if not token:
+        return False
+    return any(hmac.compare_digest(token.encode(), known.encode()) for known in known_tokens)
+
+
+def is_admin_email(email: str) -> bool:
+    """Whether an email is listed in ADMIN_EMAILS"""
+    return email.lower() in ADMIN_EMAILS
+
+
+async def get_current_permissions(
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
+    db: Session = Depends(get_db)
+) -> UserPermissions:
+    """
+    Dependency resolving the caller's permissions from the JWT without
+    loading the full user row.
+
+    Raises:
+        HTTPException: If the token is invalid, the user is unknown or inactive
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    payload = decode_token(credentials.credentials) if credentials else None
+    if payload is None:
+        raise credentials_exception
+
+    try:
+        user_id = int(payload.get("sub"))
+    except (ValueError, TypeError):
+        raise credentials_exception
+
+    permissions = get_user_permissions(db, user_id)
+    if permissions is None:
+        raise credentials_exception
+
+    if not permissions.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Inactive user"
+        )
+    activity_tracker.record_seen(user_id)
+    return permissions
+
+
+async def require_sender(
+    permissions: UserPermissions = Depends(get_current_permissions)
+) -> UserPermissions:
+    """
+    Dependency requiring approved sender access (admins always pass).
+
+    Raises:
+        HTTPException: If the user is neither an approved sender nor an admin
+    """
+    if not (permissions.is_sender or permissions.is_admin):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Sender access required"
+        )
+    return permissions
+
+
+async def require_admin(
+    permissions: UserPermissions = Depends(get_current_permissions)
+) -> UserPermissions:
+    """
+    Dependency requiring an admin (ops) account.
+
+    Raises:
+        HTTPException: If the user is not an admin
+    """
+    if not permissions.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return permissions
+
+
+async def require_internal_service(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
+    db: Session = Depends(get_db)
+) -> Optional[UserPermissions]:
+    """
+    Dependency for internal endpoints: a valid ``X-Internal-Token``
+    (one of INTERNAL_SERVICE_TOKENS) or an admin bearer token.
+
+    Returns:
+        None for service callers, the admin's permissions otherwise
+
+    Raises:
+        HTTPException: If neither credential is valid
+    """
+    if token_matches(request.headers.get("x-internal-token"), INTERNAL_SERVICE_TOKENS):
+        return None
+
+    permissions = await get_current_permissions(credentials, db)
+    return await require_admin(permissions)
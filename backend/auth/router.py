@@ -9,18 +9,26 @@ from datetime import datetime, timedelta
 from typing import Optional
 
 import httpx
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Header, Request, Response
+from fastapi.concurrency import run_in_threadpool
 import cloudinary
 import cloudinary.uploader
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 
+from admission import bcrypt_admission
 from database import get_db
-from models import User, VerificationCode
+from models import User, VerificationCode, normalize_email
+from auth.activity import activity_tracker
+from auth.email_filter import email_filter
 from auth.utils import (
     hash_password,
     verify_password,
     create_access_token,
     generate_otp,
+    user_etag,
+    etag_matches,
     get_current_user,
     get_current_active_user
 )
@@ -56,6 +64,17 @@ cloudinary.config(
 
 # ============ Helper Functions ============
 
+def get_user_by_email(db: Session, email: str) -> Optional[User]:
+    """
+    Look up a user by case-normalized email.
+    Emails the known-email filter rules out are answered without a query.
+    """
+    normalized = normalize_email(email)
+    if not email_filter.might_exist(db, normalized):
+        return None
+    return db.query(User).filter(User.email_normalized == normalized).first()
+
+
 def create_verification_code(db: Session, user_id: int, code_type: str) -> str:
     """Create and store a new verification code"""
     # Invalidate any existing codes of this type for the user
@@ -81,15 +100,35 @@ def create_verification_code(db: Session, user_id: int, code_type: str) -> str:
     return code
 
 
-def verify_code(db: Session, user_id: int, code: str, code_type: str) -> bool:
-    """Verify an OTP code"""
-    verification = db.query(VerificationCode).filter(
+def find_verification_code(db: Session, user_id: int, code: str, code_type: str) -> Optional[VerificationCode]:
+    """Unused, unexpired OTP code matching the input (not consumed)"""
+    return db.query(VerificationCode).filter(
         VerificationCode.user_id == user_id,
         VerificationCode.code == code,
         VerificationCode.code_type == code_type,
         VerificationCode.is_used == False,
         VerificationCode.expires_at > datetime.utcnow()
     ).first()
+
+
+def consume_verification_code(db: Session, verification: VerificationCode) -> bool:
+    """
+    Mark a code found earlier as used, unless it was used or expired since.
+    Conditional UPDATE, so two requests racing with one code can't both win.
+    Not committed.
+    """
+    claimed = db.query(VerificationCode).filter(
+        VerificationCode.id == verification.id,
+        VerificationCode.user_id == verification.user_id,
+        VerificationCode.is_used == False,
+        VerificationCode.expires_at > datetime.utcnow()
+    ).update({"is_used": True}, synchronize_session=False)
+    return claimed == 1
+
+
+def verify_code(db: Session, user_id: int, code: str, code_type: str) -> bool:
+    """Verify an OTP code"""
+    verification = find_verification_code(db, user_id, code, code_type)
     
     if verification:
         verification.is_used = True
@@ -101,13 +140,13 @@ def verify_code(db: Session, user_id: int, code: str, code_type: str) -> bool:
 # ============ Endpoints ============
 
 @router.post("/register", response_model=OTPResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, request: Request, db: Session = Depends(get_db)):
     """
     Register a new user account.
     Sends a verification OTP to the user's email.
     """
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = get_user_by_email(db, user_data.email)
     if existing_user:
         print(f"\n⚠️  [DEV] Email already exists: {user_data.email}\n")
         raise HTTPException(
@@ -115,8 +154,9 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             detail="Email already registered"
         )
     
-    # Create new user
-    hashed_password = hash_password(user_data.password)
+    # Create new user (bcrypt runs off the event loop under admission control)
+    async with bcrypt_admission.slot(request):
+        hashed_password = await run_in_threadpool(hash_password, user_data.password)
     new_user = User(
         email=user_data.email,
         password_hash=hashed_password,
@@ -126,7 +166,15 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         is_verified=False
     )
     db.add(new_user)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race with a concurrent registration for the same email
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     db.refresh(new_user)
     
     # Generate verification code
@@ -151,7 +199,7 @@ async def verify_email(data: OTPVerify, db: Session = Depends(get_db)):
     Verify user's email with OTP code.
     Returns JWT token on successful verification.
     """
-    user = db.query(User).filter(User.email == data.email).first()
+    user = get_user_by_email(db, data.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -176,6 +224,7 @@ async def verify_email(data: OTPVerify, db: Session = Depends(get_db)):
     
     # Generate access token
     access_token = create_access_token(data={"sub": str(user.id)})
+    activity_tracker.record_login(user.id)
     
     return TokenResponse(
         access_token=access_token,
@@ -184,12 +233,12 @@ async def verify_email(data: OTPVerify, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=TokenResponse)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, request: Request, db: Session = Depends(get_db)):
     """
     Login with email and password.
     Returns JWT token on successful authentication.
     """
-    user = db.query(User).filter(User.email == credentials.email).first()
+    user = get_user_by_email(db, credentials.email)
     
     if not user:
         raise HTTPException(
@@ -203,7 +252,10 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
             detail=f"This account uses {user.auth_provider} authentication"
         )
     
-    if not verify_password(credentials.password, user.password_hash):
+    async with bcrypt_admission.slot(request):
+        password_ok = await run_in_threadpool(verify_password, credentials.password, user.password_hash)
+    
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
@@ -222,6 +274,7 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
     
     # Generate access token
     access_token = create_access_token(data={"sub": str(user.id)})
+    activity_tracker.record_login(user.id)
     
     return TokenResponse(
         access_token=access_token,
@@ -272,9 +325,12 @@ async def google_auth(data: GoogleAuthRequest, db: Session = Depends(get_db)):
         )
     
     # Check if user exists
-    user = db.query(User).filter(
-        (User.email == email) | (User.google_id == google_id)
-    ).first()
+    if email:
+        user = db.query(User).filter(
+            (User.email_normalized == normalize_email(email)) | (User.google_id == google_id)
+        ).first()
+    else:
+        user = db.query(User).filter(User.google_id == google_id).first()
     
     if not user:
         # Create new user
@@ -298,6 +354,7 @@ async def google_auth(data: GoogleAuthRequest, db: Session = Depends(get_db)):
     
     # Generate access token
     access_token = create_access_token(data={"sub": str(user.id)})
+    activity_tracker.record_login(user.id)
     
     return TokenResponse(
         access_token=access_token,
@@ -310,7 +367,7 @@ async def forgot_password(data: PasswordResetRequest, db: Session = Depends(get_
     """
     Request a password reset OTP.
     """
-    user = db.query(User).filter(User.email == data.email).first()
+    user = get_user_by_email(db, data.email)
     
     if not user:
         # Don't reveal if email exists or not
@@ -340,11 +397,11 @@ async def forgot_password(data: PasswordResetRequest, db: Session = Depends(get_
 
 
 @router.post("/reset-password", response_model=MessageResponse)
-async def reset_password(data: PasswordReset, db: Session = Depends(get_db)):
+async def reset_password(data: PasswordReset, request: Request, db: Session = Depends(get_db)):
     """
     Reset password using OTP code.
     """
-    user = db.query(User).filter(User.email == data.email).first()
+    user = get_user_by_email(db, data.email)
     
     if not user:
         raise HTTPException(
@@ -352,14 +409,27 @@ async def reset_password(data: PasswordReset, db: Session = Depends(get_db)):
             detail="User not found"
         )
     
-    if not verify_code(db, user.id, data.code, "password_reset"):
+    # Check the code before spending a bcrypt slot on it, but only consume it
+    # once the hash is done so a shed request can be retried with the same code
+    verification = find_verification_code(db, user.id, data.code, "password_reset")
+    if not verification:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired reset code"
+        )
+    
+    async with bcrypt_admission.slot(request):
+        new_password_hash = await run_in_threadpool(hash_password, data.new_password)
+    
+    if not consume_verification_code(db, verification):
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired reset code"
         )
     
-    # Update password
-    user.password_hash = hash_password(data.new_password)
+    # Update password together with the code
+    user.password_hash = new_password_hash
     db.commit()
     
     return MessageResponse(message="Password reset successfully")
@@ -370,7 +440,7 @@ async def resend_otp(data: ResendOTPRequest, db: Session = Depends(get_db)):
     """
     Resend OTP code for verification or password reset.
     """
-    user = db.query(User).filter(User.email == data.email).first()
+    user = get_user_by_email(db, data.email)
     
     if not user:
         raise HTTPException(
@@ -392,24 +462,45 @@ async def resend_otp(data: ResendOTPRequest, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_active_user)):
+async def get_me(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_active_user)
+):
     """
     Get current authenticated user's profile.
     Protected endpoint - requires valid JWT token.
+    Returns 304 Not Modified when If-None-Match matches the current ETag.
     """
+    etag = user_etag(current_user)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    response.headers["ETag"] = etag
     return UserResponse.model_validate(current_user)
 
 
 @router.put("/profile", response_model=UserResponse)
 async def update_profile(
     profile_data: UserUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
     Update current user's profile.
     Protected endpoint - requires valid JWT token.
+    Send If-Match with the ETag from /auth/me to reject lost updates (412).
     """
+    precondition_failed = HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Profile was modified by another request. Reload and try again."
+    )
+    
+    if if_match is not None and not etag_matches(if_match, user_etag(current_user), weak=False):
+        raise precondition_failed
+    
     # Update only provided fields
     if profile_data.first_name is not None:
         current_user.first_name = profile_data.first_name
@@ -420,11 +511,17 @@ async def update_profile(
     if profile_data.country is not None:
         current_user.country = profile_data.country
     
-    db.commit()
+    # The row_version check in the UPDATE catches writes that raced past If-Match
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise precondition_failed
     db.refresh(current_user)
     
     print(f"\n✅ [DEV] Profile updated for {current_user.email}\n")
     
+    response.headers["ETag"] = user_etag(current_user)
     return UserResponse.model_validate(current_user)
 
 
@@ -434,6 +531,7 @@ UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
 
 @router.post("/upload-avatar", response_model=UserResponse)
 async def upload_avatar(
+    response: Response,
     file: UploadFile = File(...),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
@@ -498,4 +596,5 @@ async def upload_avatar(
     db.commit()
     db.refresh(current_user)
     
+    response.headers["ETag"] = user_etag(current_user)
     return UserResponse.model_validate(current_user)
@@ -81,6 +81,7 @@ class UserResponse(BaseModel):
     avatar_url: Optional[str] = None
     is_verified: bool
     is_sender: bool
+    sender_request_status: Optional[str] = None
     auth_provider: str
     created_at: datetime
 
@@ -17,13 +17,13 @@ from sqlalchemy.orm import Session
 
 from database import get_db
 from models import User
+from auth.keys import JWT_ALGORITHM, key_ring
+from auth.activity import activity_tracker
 
 # Load environment variables
 load_dotenv()
 
 # Configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "fallback-secret-key-for-development")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
 # Password hashing context
@@ -45,7 +45,7 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
-    Create a JWT access token.
+    Create a JWT access token signed with the active key ring key.
     
     Args:
         data: Payload to encode in the token
@@ -62,13 +62,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    signing_key = key_ring.active
+    encoded_jwt = jwt.encode(
+        to_encode,
+        signing_key.signer,
+        algorithm=JWT_ALGORITHM,
+        headers={"kid": signing_key.kid}
+    )
     return encoded_jwt
 
 
 def decode_token(token: str) -> Optional[dict]:
     """
     Decode and validate a JWT token.
+    The verification key is selected by the token's ``kid`` header.
     
     Args:
         token: JWT token string
@@ -77,7 +84,12 @@ def decode_token(token: str) -> Optional[dict]:
         Decoded payload or None if invalid
     """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        kid = jwt.get_unverified_header(token).get("kid")
+        verification_key = key_ring.get(kid) if kid else None
+        if verification_key is None:
+            print(f"❌ [DEBUG] Unknown signing key id: {kid}")
+            return None
+        payload = jwt.decode(token, verification_key.verifier, algorithms=[JWT_ALGORITHM])
         print(f"✅ [DEBUG] Token decoded successfully: {payload}")
         return payload
     except JWTError as e:
@@ -85,6 +97,41 @@ def decode_token(token: str) -> Optional[dict]:
         return None
 
 
+def user_etag(user: User) -> str:
+    """
+    Build the entity tag for a user's profile representation.
+    The row version changes on every update, so it identifies the state exactly.
+    """
+    return f'"{user.id}-{user.row_version}"'
+
+
+def etag_matches(header_value: Optional[str], etag: str, weak: bool = True) -> bool:
+    """
+    Check an If-None-Match / If-Match header against an entity tag.
+    
+    Args:
+        header_value: Raw header value (comma-separated tags or "*")
+        etag: Current entity tag of the resource
+        weak: Use weak comparison (If-None-Match) instead of strong (If-Match)
+        
+    Returns:
+        True if any listed tag matches
+    """
+    if not header_value:
+        return False
+    for candidate in header_value.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
 def generate_otp(length: int = 4) -> str:
     """
     Generate a random numeric OTP code.
@@ -148,6 +195,7 @@ async def get_current_user(
         raise credentials_exception
     
     print(f"✅ [DEBUG] User authenticated: {user.email}")
+    activity_tracker.record_seen(user.id)
     return user
 
 
@@ -1,30 +1,38 @@
 """
 Database configuration for Horizn Backend
-SQLAlchemy with SQLite
+SQLAlchemy with SQLite, optionally sharding users across several databases
 """
 import os
-from sqlalchemy import create_engine
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
 
+from sharding import ShardRouter, create_db_engine, parse_shard_urls
+
 load_dotenv()
 
 # Get Database URL from environment or fallback to local SQLite
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./horizn.db")
 
+# Optional user shards (see sharding.py); DATABASE_URL stays the primary
+DATABASE_SHARD_URLS = parse_shard_urls(os.getenv("DATABASE_SHARD_URLS", ""))
+
 # Configure engine based on database type
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, 
-        connect_args={"check_same_thread": False}  # Required for SQLite
-    )
-else:
-    # PostgreSQL settings
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_db_engine(SQLALCHEMY_DATABASE_URL)
 
 # Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if DATABASE_SHARD_URLS:
+    shard_router = ShardRouter(
+        engine,
+        {name: create_db_engine(url) for name, url in DATABASE_SHARD_URLS.items()}
+    )
+    SessionLocal = sessionmaker(class_=shard_router.create_session_class(), autoflush=False)
+else:
+    shard_router = None
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Base class for models
 Base = declarative_base()
@@ -40,3 +48,17 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def group_by_user_shard(rows: List[dict], user_id_key: str = "user_id") -> List[Tuple[Dict[str, str], List[dict]]]:
+    """
+    Split per-user parameter rows for a Core executemany into
+    (bind_arguments, rows) pairs, one per database that holds them.
+    Without sharding this is a single pair with no bind arguments.
+    """
+    if shard_router is None:
+        return [({}, rows)]
+    groups: Dict[str, List[dict]] = defaultdict(list)
+    for row in rows:
+        groups[shard_router.shard_for_user(row[user_id_key])].append(row)
+    return [({"shard_id": shard_id}, shard_rows) for shard_id, shard_rows in groups.items()]
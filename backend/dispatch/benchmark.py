@@ -0,0 +1,91 @@
+"""
+Dispatch Index Benchmark for Horizn Backend
+Measures update throughput and nearest-bot query latency
+
+Usage:
+    python -m dispatch.benchmark --bots 10000 100000 --queries 2000
+
+For each fleet size, bots are scattered over a city-sized area, then
+the grid index is compared against a brute-force vectorized scan of
+every bot (which also verifies the index returns the same answers).
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from dispatch.index import BotIndex, haversine_km
+
+
+def percentile(samples, q: float) -> float:
+    return float(np.percentile(np.array(samples), q))
+
+
+def run(bots: int, queries: int, k: int, spread: float, idle_ratio: float, seed: int) -> None:
+    """Benchmark one fleet size and print a summary line"""
+    rng = random.Random(seed)
+    center_lat, center_lon = 6.5244, 3.3792
+    lats = np.array([center_lat + rng.uniform(-spread, spread) for _ in range(bots)])
+    lons = np.array([center_lon + rng.uniform(-spread, spread) for _ in range(bots)])
+    statuses = ["idle" if rng.random() < idle_ratio else "en_route" for _ in range(bots)]
+
+    index = BotIndex()
+    now = time.time()
+    started = time.perf_counter()
+    for i in range(bots):
+        index.update(f"bot-{i}", lats[i], lons[i], statuses[i], 80.0, now)
+    update_seconds = time.perf_counter() - started
+
+    idle = np.array([status == "idle" for status in statuses])
+    idle_ids = np.flatnonzero(idle)
+    points = [
+        (center_lat + rng.uniform(-spread, spread), center_lon + rng.uniform(-spread, spread))
+        for _ in range(queries)
+    ]
+
+    index_latency = []
+    mismatches = 0
+    for lat, lon in points:
+        started = time.perf_counter()
+        result = index.nearest(lat, lon, k=k, radius_km=50.0)
+        index_latency.append(time.perf_counter() - started)
+
+        distances = haversine_km(lat, lon, lats[idle_ids], lons[idle_ids])
+        expected = np.sort(distances)[:k]
+        got = np.array([bot["distance_km"] for bot in result])
+        if len(got) != len(expected) or not np.allclose(got, expected):
+            mismatches += 1
+
+    brute_latency = []
+    for lat, lon in points:
+        started = time.perf_counter()
+        distances = haversine_km(lat, lon, lats[idle_ids], lons[idle_ids])
+        np.argpartition(distances, k - 1)[:k]
+        brute_latency.append(time.perf_counter() - started)
+
+    print(
+        f"bots={bots:>7} updates/s={bots / update_seconds:>9.0f} "
+        f"index p50={percentile(index_latency, 50) * 1000:.3f}ms p99={percentile(index_latency, 99) * 1000:.3f}ms "
+        f"brute p50={percentile(brute_latency, 50) * 1000:.3f}ms p99={percentile(brute_latency, 99) * 1000:.3f}ms "
+        f"mismatches={mismatches}"
+    )
+
+
+def main():
+    """CLI entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the dispatch spatial index")
+    parser.add_argument("--bots", type=int, nargs="+", default=[10000, 100000], help="Fleet sizes")
+    parser.add_argument("--queries", type=int, default=1000, help="Queries per fleet size")
+    parser.add_argument("-k", type=int, default=10, help="Bots per query")
+    parser.add_argument("--spread", type=float, default=0.25, help="Half-width of the area in degrees")
+    parser.add_argument("--idle-ratio", type=float, default=0.3, help="Fraction of idle bots")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for bots in args.bots:
+        run(bots, args.queries, args.k, args.spread, args.idle_ratio, args.seed)
+
+
+if __name__ == "__main__":
+    main()
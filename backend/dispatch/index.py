@@ -0,0 +1,321 @@
+"""
+Bot Spatial Index for Horizn Backend
+In-memory grid index of bot positions for nearest-bot dispatch queries
+"""
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import BotStatus, BotTelemetry
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+DISPATCH_CELL_DEGREES = float(os.getenv("DISPATCH_CELL_DEGREES", "0.01"))  # ~1.1 km
+DISPATCH_MAX_AGE_SECONDS = float(os.getenv("DISPATCH_MAX_AGE_SECONDS", "120"))
+DISPATCH_REBUILD_WINDOW_MINUTES = int(os.getenv("DISPATCH_REBUILD_WINDOW_MINUTES", "30"))
+DISPATCH_MAX_SCAN_CELLS = int(os.getenv("DISPATCH_MAX_SCAN_CELLS", "40000"))
+
+# Longitude cells shrink to nothing at the poles; queries are refused past this
+MAX_LATITUDE = 85.0
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+Cell = Tuple[int, int]
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distance from one point to arrays of points, in km"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(lons) - math.radians(lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class BotIndex:
+    """
+    Latest known state of every bot, with idle bots bucketed in a fixed
+    lat/lon grid.
+
+    State lives in parallel numpy arrays addressed by slot so candidate
+    sets can be filtered and ranked without Python loops. A nearest query
+    scans grid rings outward from the query point until the k-th best
+    distance is provably inside the scanned area, so cost depends on bot
+    density near the point rather than the fleet size. When the radius
+    would take more than DISPATCH_MAX_SCAN_CELLS cells (longitude cells
+    narrow towards the poles), all idle bots are ranked in one pass instead.
+    """
+
+    def __init__(self, cell_degrees: float = DISPATCH_CELL_DEGREES, capacity: int = 1024):
+        self.cell_degrees = cell_degrees
+        self._lock = threading.Lock()
+        self._slots: Dict[str, int] = {}
+        self._bot_ids: List[Optional[str]] = [None] * capacity
+        self._free: List[int] = []
+        self._size = 0
+        self._lat = np.zeros(capacity)
+        self._lon = np.zeros(capacity)
+        self._battery = np.zeros(capacity)
+        self._updated = np.zeros(capacity)  # Unix time of the frame
+        self._status: List[Optional[str]] = [None] * capacity
+        self._cell_of: Dict[int, Cell] = {}  # Slot -> grid cell (idle bots only)
+        self._cells: Dict[Cell, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def cell(self, latitude: float, longitude: float) -> Cell:
+        """Grid cell containing a point"""
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+
+    def update(
+        self,
+        bot_id: str,
+        latitude: float,
+        longitude: float,
+        status: str,
+        battery: float,
+        updated_at: Optional[float] = None
+    ) -> None:
+        """Record a bot's latest state (O(1))"""
+        with self._lock:
+            slot = self._slots.get(bot_id)
+            if slot is None:
+                slot = self._allocate(bot_id)
+
+            self._lat[slot] = latitude
+            self._lon[slot] = longitude
+            self._battery[slot] = battery
+            self._updated[slot] = updated_at if updated_at is not None else time.time()
+            self._status[slot] = status
+
+            old_cell = self._cell_of.get(slot)
+            new_cell = self.cell(latitude, longitude) if status == BotStatus.IDLE.value else None
+            if old_cell != new_cell:
+                if old_cell is not None:
+                    self._remove_from_cell(slot, old_cell)
+                if new_cell is not None:
+                    self._cells.setdefault(new_cell, set()).add(slot)
+                    self._cell_of[slot] = new_cell
+
+    def remove(self, bot_id: str) -> None:
+        """Forget a bot entirely"""
+        with self._lock:
+            slot = self._slots.pop(bot_id, None)
+            if slot is None:
+                return
+            cell = self._cell_of.get(slot)
+            if cell is not None:
+                self._remove_from_cell(slot, cell)
+            self._bot_ids[slot] = None
+            self._status[slot] = None
+            self._free.append(slot)
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 5,
+        radius_km: float = 25.0,
+        min_battery: float = 0.0,
+        max_age_seconds: float = DISPATCH_MAX_AGE_SECONDS
+    ) -> List[dict]:
+        """
+        Nearest k idle bots within radius_km, closest first.
+        Bots whose last frame is older than max_age_seconds are skipped.
+
+        Raises:
+            ValueError: If latitude is beyond MAX_LATITUDE
+        """
+        if abs(latitude) > MAX_LATITUDE:
+            raise ValueError(f"Latitude must be within ±{MAX_LATITUDE}")
+
+        cutoff = time.time() - max_age_seconds
+        center = self.cell(latitude, longitude)
+
+        # Ring r covers at least r cells in every direction; the narrowest
+        # cell side is the longitude span at the highest latitude scanned
+        max_lat = min(abs(latitude) + radius_km / KM_PER_DEGREE, 89.9)
+        cell_km = self.cell_degrees * KM_PER_DEGREE * math.cos(math.radians(max_lat))
+        max_ring = max(1, math.ceil(radius_km / cell_km))
+
+        with self._lock:
+            # Past DISPATCH_MAX_SCAN_CELLS (large radii at high latitudes) one
+            # vectorized pass over every idle bot is cheaper than the rings
+            if (2 * max_ring + 1) ** 2 > DISPATCH_MAX_SCAN_CELLS:
+                slots = np.fromiter(self._cell_of, dtype=np.int64, count=len(self._cell_of))
+                best = self._closest(slots, latitude, longitude, k, radius_km, min_battery, cutoff)
+                return self._results(*best)
+
+            candidates: List[int] = []
+            best: Optional[Tuple[np.ndarray, np.ndarray]] = None
+            for ring in range(0, max_ring + 1):
+                candidates.extend(self._ring_slots(center, ring))
+                if not candidates:
+                    continue
+
+                slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+                best = self._closest(slots, latitude, longitude, k, radius_km, min_battery, cutoff)
+                candidates = best[0].tolist()
+
+                # Every unscanned bot is at least ring * cell_km away
+                slots, distances = best
+                if len(slots) >= k and distances.max() <= ring * cell_km:
+                    break
+
+            if best is None:
+                return []
+            return self._results(*best)
+
+    def rebuild_from_db(self, db: Session, window_minutes: int = DISPATCH_REBUILD_WINDOW_MINUTES) -> int:
+        """
+        Load each bot's latest telemetry frame from the last window_minutes.
+
+        Returns:
+            Number of bots loaded
+        """
+        since = datetime.utcnow() - timedelta(minutes=window_minutes)
+        latest = (
+            db.query(func.max(BotTelemetry.id).label("id"))
+            .filter(BotTelemetry.recorded_at >= since)
+            .group_by(BotTelemetry.bot_id)
+            .subquery()
+        )
+        rows = (
+            db.query(
+                BotTelemetry.bot_id,
+                BotTelemetry.latitude,
+                BotTelemetry.longitude,
+                BotTelemetry.status,
+                BotTelemetry.battery,
+                BotTelemetry.recorded_at
+            )
+            .join(latest, BotTelemetry.id == latest.c.id)
+            .yield_per(5000)
+        )
+
+        count = 0
+        for row in rows:
+            self.update(row.bot_id, row.latitude, row.longitude, row.status, row.battery, to_timestamp(row.recorded_at))
+            count += 1
+        return count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "bots": len(self._slots),
+                "idle": len(self._cell_of),
+                "cells": len(self._cells),
+                "cell_degrees": self.cell_degrees,
+            }
+
+    def _allocate(self, bot_id: str) -> int:
+        """Assign a slot to a new bot, growing the arrays when full"""
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = self._size
+            if slot == len(self._lat):
+                self._grow()
+            self._size += 1
+        self._slots[bot_id] = slot
+        self._bot_ids[slot] = bot_id
+        return slot
+
+    def _grow(self) -> None:
+        capacity = len(self._lat) * 2
+        for name in ("_lat", "_lon", "_battery", "_updated"):
+            array = getattr(self, name)
+            grown = np.zeros(capacity)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+        self._bot_ids.extend([None] * (capacity - len(self._bot_ids)))
+        self._status.extend([None] * (capacity - len(self._status)))
+
+    def _remove_from_cell(self, slot: int, cell: Cell) -> None:
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(slot)
+            if not members:
+                del self._cells[cell]
+        del self._cell_of[slot]
+
+    def _closest(
+        self,
+        slots: np.ndarray,
+        latitude: float,
+        longitude: float,
+        k: int,
+        radius_km: float,
+        min_battery: float,
+        cutoff: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Fresh, charged candidates within radius_km, cut down to the k closest"""
+        keep = (self._updated[slots] >= cutoff) & (self._battery[slots] >= min_battery)
+        slots = slots[keep]
+        distances = haversine_km(latitude, longitude, self._lat[slots], self._lon[slots])
+        within = distances <= radius_km
+        slots, distances = slots[within], distances[within]
+
+        # Only the current top k can be in the final answer
+        if len(slots) > k:
+            top = np.argpartition(distances, k - 1)[:k]
+            slots, distances = slots[top], distances[top]
+        return slots, distances
+
+    def _results(self, slots: np.ndarray, distances: np.ndarray) -> List[dict]:
+        order = np.argsort(distances)
+        return [
+            {
+                "bot_id": self._bot_ids[slot],
+                "latitude": float(self._lat[slot]),
+                "longitude": float(self._lon[slot]),
+                "battery": float(self._battery[slot]),
+                "status": self._status[slot],
+                "distance_km": float(distance),
+            }
+            for slot, distance in zip(slots[order].tolist(), distances[order].tolist())
+        ]
+
+    def _ring_slots(self, center: Cell, ring: int) -> List[int]:
+        """Slots in the square ring of cells at Chebyshev distance ring"""
+        ci, cj = center
+        if ring == 0:
+            return list(self._cells.get(center, ()))
+
+        slots: List[int] = []
+        for i in range(ci - ring, ci + ring + 1):
+            if i in (ci - ring, ci + ring):
+                columns = range(cj - ring, cj + ring + 1)
+            else:
+                columns = (cj - ring, cj + ring)
+            for j in columns:
+                members = self._cells.get((i, j))
+                if members:
+                    slots.extend(members)
+        return slots
+
+
+def to_timestamp(value: Optional[datetime]) -> float:
+    """Unix time for a stored datetime (naive values are UTC)"""
+    if value is None:
+        return time.time()
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+# Process-wide index, rebuilt in the application lifespan
+bot_index = BotIndex()
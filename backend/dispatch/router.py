@@ -0,0 +1,49 @@
+"""
+Dispatch Router for Horizn Backend
+Nearest-available-bot queries served from the in-memory spatial index
+"""
+from fastapi import APIRouter, Depends, Query
+
+from auth.permissions import UserPermissions, require_admin, require_sender
+from dispatch.index import bot_index, DISPATCH_MAX_AGE_SECONDS, MAX_LATITUDE
+from dispatch.schemas import NearbyBot, NearestBotsResponse
+
+router = APIRouter(prefix="/dispatch", tags=["Dispatch"])
+
+
+# ============ Endpoints ============
+
+@router.get("/nearest", response_model=NearestBotsResponse)
+async def nearest_bots(
+    lat: float = Query(..., ge=-MAX_LATITUDE, le=MAX_LATITUDE, description="Pickup latitude"),
+    lon: float = Query(..., ge=-180, le=180, description="Pickup longitude"),
+    k: int = Query(5, ge=1, le=100, description="Number of bots"),
+    radius_km: float = Query(25.0, gt=0, le=200),
+    min_battery: float = Query(0.0, ge=0, le=100),
+    sender: UserPermissions = Depends(require_sender)
+):
+    """
+    Nearest k idle bots to a pickup point, closest first.
+    Only bots that reported within DISPATCH_MAX_AGE_SECONDS are considered.
+    """
+    bots = bot_index.nearest(
+        lat,
+        lon,
+        k=k,
+        radius_km=radius_km,
+        min_battery=min_battery,
+        max_age_seconds=DISPATCH_MAX_AGE_SECONDS
+    )
+    return NearestBotsResponse(
+        latitude=lat,
+        longitude=lon,
+        bots=[NearbyBot(**bot) for bot in bots]
+    )
+
+
+@router.get("/stats")
+async def dispatch_stats(admin: UserPermissions = Depends(require_admin)):
+    """
+    [ADMIN] Spatial index counters for this worker.
+    """
+    return bot_index.stats()
@@ -0,0 +1,25 @@
+"""
+Pydantic Schemas for Dispatch
+Request/Response models for nearest-bot queries
+"""
+from typing import List
+from pydantic import BaseModel
+
+
+# ============ Response Schemas ============
+
+class NearbyBot(BaseModel):
+    """Schema for one candidate bot"""
+    bot_id: str
+    latitude: float
+    longitude: float
+    battery: float
+    status: str
+    distance_km: float
+
+
+class NearestBotsResponse(BaseModel):
+    """Schema for a nearest-bots query result"""
+    latitude: float
+    longitude: float
+    bots: List[NearbyBot]
@@ -0,0 +1,423 @@
+"""
+Idempotency-Key Handling for Horizn Backend
+Replays the stored response for retried POSTs instead of re-executing them
+
+Usage:
+    python -m idempotency check
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+
+from cache import TTLCache
+from database import SessionLocal
+from models import IdempotencyKey
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory")  # memory or database
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+
+MAX_KEY_LENGTH = 255
+
+# Response headers worth replaying (others are per-connection or recomputed)
+REPLAYED_HEADERS = {b"content-type", b"etag", b"location", b"retry-after"}
+
+
+class IdempotencyRecord(NamedTuple):
+    """A completed response stored under an idempotency key"""
+    fingerprint: str
+    status_code: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+# ============ Backends ============
+
+class MemoryIdempotencyBackend:
+    """Per-process TTL cache; enough for a single worker"""
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL_SECONDS):
+        self._records = TTLCache(maxsize=100000, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        return self._records.get(key)
+
+    async def acquire(self, key: str) -> bool:
+        # In-process duplicates are already serialized by the middleware
+        return True
+
+    async def set(self, key: str, record: IdempotencyRecord) -> None:
+        self._records.set(key, record)
+
+    async def release(self, key: str) -> None:
+        pass
+
+
+class DatabaseIdempotencyBackend:
+    """
+    Shared backend on the idempotency_keys table so duplicates landing on
+    different workers still execute once. A row is inserted as a lock
+    before executing; the primary key makes concurrent claims exclusive.
+    """
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL_SECONDS, lock_timeout: float = IDEMPOTENCY_WAIT_SECONDS):
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+
+    async def get(self, key: str) -> Optional[IdempotencyRecord]:
+        return await asyncio.to_thread(self._get, key)
+
+    async def acquire(self, key: str) -> bool:
+        return await asyncio.to_thread(self._acquire, key)
+
+    async def set(self, key: str, record: IdempotencyRecord) -> None:
+        await asyncio.to_thread(self._set, key, record)
+
+    async def release(self, key: str) -> None:
+        await asyncio.to_thread(self._release, key)
+
+    def _get(self, key: str) -> Optional[IdempotencyRecord]:
+        db = SessionLocal()
+        try:
+            row = db.query(IdempotencyKey).filter(
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.isnot(None),
+                IdempotencyKey.expires_at > datetime.utcnow()
+            ).first()
+            if row is None:
+                return None
+            return IdempotencyRecord(
+                fingerprint=row.fingerprint,
+                status_code=row.status_code,
+                headers=[(name.encode(), value.encode()) for name, value in json.loads(row.headers)],
+                body=row.body
+            )
+        finally:
+            db.close()
+
+    def _acquire(self, key: str) -> bool:
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            # Expired results and abandoned locks no longer hold the key
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key == key,
+                IdempotencyKey.expires_at <= now
+            ).delete(synchronize_session=False)
+            db.add(IdempotencyKey(
+                key=key,
+                fingerprint="",
+                expires_at=now + timedelta(seconds=self.lock_timeout)
+            ))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    def _set(self, key: str, record: IdempotencyRecord) -> None:
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update({
+                "fingerprint": record.fingerprint,
+                "status_code": record.status_code,
+                "headers": json.dumps([(name.decode(), value.decode()) for name, value in record.headers]),
+                "body": record.body,
+                "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl)
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _release(self, key: str) -> None:
+        db = SessionLocal()
+        try:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None)
+            ).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+def create_backend():
+    """Pick the storage backend from IDEMPOTENCY_BACKEND"""
+    if IDEMPOTENCY_BACKEND == "database":
+        return DatabaseIdempotencyBackend()
+    return MemoryIdempotencyBackend()
+
+
+# ============ Fingerprinting ============
+
+# Stand-in for multipart boundaries, which clients pick afresh per request
+FINGERPRINT_BOUNDARY = b"idempotency-boundary"
+
+
+def multipart_boundary(content_type: bytes) -> Optional[bytes]:
+    """Boundary parameter of a ``multipart/*`` Content-Type, if any"""
+    media_type, _, params = content_type.partition(b";")
+    if not media_type.strip().lower().startswith(b"multipart/"):
+        return None
+    for param in params.split(b";"):
+        name, _, value = param.partition(b"=")
+        if name.strip().lower() == b"boundary":
+            return value.strip().strip(b'"') or None
+    return None
+
+
+def request_fingerprint(content_type: bytes, body: bytes) -> str:
+    """
+    Hash identifying a request body. Multipart boundaries are replaced by
+    a constant first, so a retried upload of the same parts matches the
+    original even though the client generated a new boundary for it.
+    """
+    boundary = multipart_boundary(content_type)
+    if boundary is not None:
+        body = body.replace(b"--" + boundary, b"--" + FINGERPRINT_BOUNDARY)
+    return hashlib.sha256(body).hexdigest()
+
+
+# ============ Middleware ============
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware honouring the ``Idempotency-Key`` header on selected
+    POST routes.
+
+    The first request with a key runs normally and its response (unless
+    5xx) is stored. Retries with the same key and body get the stored
+    response with ``Idempotent-Replayed: true``; the same key with a
+    different body is rejected with 422. A duplicate that arrives while
+    the original is still running waits for its result instead of
+    executing in parallel. Keys are scoped by path and Authorization
+    header so different callers can't collide.
+    """
+
+    def __init__(self, app, paths: Iterable[str], backend=None, wait_seconds: float = IDEMPOTENCY_WAIT_SECONDS):
+        self.app = app
+        self.paths = set(paths)
+        self.backend = backend or create_backend()
+        self.wait_seconds = wait_seconds
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(b"idempotency-key")
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            await self._send_error(send, 400, f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+            return
+
+        body = await self._read_body(receive)
+        if body is None:
+            # Client went away mid-upload: nothing to run, nothing to record
+            return
+        fingerprint = request_fingerprint(headers.get(b"content-type", b""), body)
+        key = hashlib.sha256(b"\0".join([
+            scope["path"].encode(),
+            headers.get(b"authorization", b""),
+            idempotency_key
+        ])).hexdigest()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_seconds
+        while True:
+            record = await self.backend.get(key)
+            if record is not None:
+                await self._replay(send, record, fingerprint)
+                return
+
+            inflight = self._inflight.get(key)
+            if inflight is not None:
+                # Same key running in this process: wait for it, then re-check
+                try:
+                    await asyncio.wait_for(asyncio.shield(inflight), max(0.0, deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+                    return
+                continue
+
+            self._inflight[key] = loop.create_future()
+            if await self.backend.acquire(key):
+                break
+
+            # Another worker holds the key: poll the shared backend for its result
+            self._finish(key)
+            if loop.time() >= deadline:
+                await self._send_error(send, 409, "A request with this Idempotency-Key is still in progress")
+                return
+            await asyncio.sleep(0.1)
+
+        status_code = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def replay_receive():
+            nonlocal body
+            if body is None:
+                return await receive()
+            message = {"type": "http.request", "body": body, "more_body": False}
+            body = None
+            return message
+
+        async def capture_send(message):
+            nonlocal status_code, response_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() in REPLAYED_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        finally:
+            if status_code < 500:
+                await self.backend.set(key, IdempotencyRecord(fingerprint, status_code, response_headers, b"".join(chunks)))
+            else:
+                await self.backend.release(key)
+            self._finish(key)
+
+    def _finish(self, key: str) -> None:
+        """Wake in-process duplicates waiting on this key"""
+        inflight = self._inflight.pop(key, None)
+        if inflight is not None and not inflight.done():
+            inflight.set_result(None)
+
+    @staticmethod
+    async def _read_body(receive) -> Optional[bytes]:
+        """Full request body, or None if the client disconnected before sending it"""
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return None
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    async def _replay(self, send, record: IdempotencyRecord, fingerprint: str) -> None:
+        if record.fingerprint != fingerprint:
+            await self._send_error(send, 422, "Idempotency-Key was already used with a different request body")
+            return
+        headers = list(record.headers) + [
+            (b"content-length", str(len(record.body)).encode()),
+            (b"idempotent-replayed", b"true"),
+        ]
+        await send({"type": "http.response.start", "status": record.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": record.body})
+
+    @staticmethod
+    async def _send_error(send, status_code: int, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# ============ Self-Check ============
+
+async def _post(middleware, path: str, key: bytes, content_type: bytes, body: bytes) -> Tuple[int, dict]:
+    """Send one POST through the middleware, returning (status, response headers)"""
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": path,
+        "headers": [(b"idempotency-key", key), (b"content-type", content_type)],
+    }
+    sent: List[dict] = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    start = sent[0]
+    return start["status"], dict(start.get("headers", []))
+
+
+def _multipart(boundary: bytes, content: bytes) -> bytes:
+    return (
+        b"--" + boundary + b"\r\n"
+        b'Content-Disposition: form-data; name="file"; filename="avatar.jpg"\r\n'
+        b"Content-Type: image/jpeg\r\n\r\n" + content + b"\r\n"
+        b"--" + boundary + b"--\r\n"
+    )
+
+
+async def self_check() -> List[str]:
+    """
+    Replay scenarios against a stub app with the in-memory backend.
+
+    Returns:
+        Descriptions of the scenarios that failed (empty when all pass)
+    """
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    middleware = IdempotencyMiddleware(app, ["/upload"], backend=MemoryIdempotencyBackend())
+    failures = []
+
+    # A retried upload carries the same parts under a fresh boundary
+    first = await _post(middleware, "/upload", b"k1", b"multipart/form-data; boundary=aaa111", _multipart(b"aaa111", b"JPEG"))
+    retry = await _post(middleware, "/upload", b"k1", b'multipart/form-data; boundary="bbb222"', _multipart(b"bbb222", b"JPEG"))
+    if first[0] != 200 or retry[0] != 200 or retry[1].get(b"idempotent-replayed") != b"true" or len(calls) != 1:
+        failures.append(f"multipart retry with a new boundary was not replayed (statuses {first[0]}, {retry[0]}; app ran {len(calls)}x)")
+
+    # The same key with different parts is still a conflict
+    changed = await _post(middleware, "/upload", b"k1", b"multipart/form-data; boundary=ccc333", _multipart(b"ccc333", b"PNG"))
+    if changed[0] != 422:
+        failures.append(f"multipart body with different parts was accepted under a used key (status {changed[0]})")
+
+    return failures
+
+
+def main():
+    """Run the idempotency self-check"""
+    parser = argparse.ArgumentParser(description="Idempotency-Key handling checks")
+    parser.add_argument("command", choices=["check"])
+    parser.parse_args()
+
+    failures = asyncio.run(self_check())
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        raise SystemExit(1)
+    print("✅ Idempotency replay checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,30 @@ FastAPI server with authentication and CORS support
 """
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
-from database import engine, Base
+from database import engine, Base, SessionLocal, shard_router
+from migrations import run_migrations
+from admission import bcrypt_admission, import_admission
+from idempotency import IdempotencyMiddleware
+from profiling import ProfilingMiddleware
+from auth.keys import key_ring
+from auth.activity import activity_tracker
+from auth.email_filter import email_filter
 from auth.router import router as auth_router
+from senders.router import router as senders_router
+from telemetry.buffer import telemetry_buffer
+from telemetry.router import router as telemetry_router
+from tracking.hub import tracking_hub
+from tracking.router import router as tracking_router
+from dispatch.index import bot_index
+from dispatch.router import router as dispatch_router
+from users.router import router as users_router, internal_router as internal_users_router
+from users.importer import shutdown_server_hash_pool
+from users.lookup import user_lookup
 
 # Ensure uploads directory exists
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
@@ -21,14 +38,38 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 async def lifespan(app: FastAPI):
     """
     Application lifespan handler.
-    Creates database tables on startup.
+    Creates database tables, applies migrations, loads JWT signing keys
+    and starts background workers on startup; flushes them on shutdown.
     """
     # Startup: Create all database tables
     Base.metadata.create_all(bind=engine)
     print("✅ Database tables created")
+    for name in run_migrations(engine):
+        print(f"🛠️  Applied migration {name}")
+    if shard_router is not None:
+        for name in shard_router.create_schema(Base.metadata):
+            print(f"🛠️  Applied migration {name}")
+        print(f"🧩 Users sharded across {len(shard_router.shards)} databases")
+    key_ring.load()
+    print(f"🔑 JWT signing key ring loaded (active kid: {key_ring.active.kid})")
+    db = SessionLocal()
+    try:
+        print(f"🗺️  Dispatch index rebuilt with {bot_index.rebuild_from_db(db)} bots")
+        print(f"📇 Email filter rebuilt with {email_filter.rebuild(db)} emails")
+    finally:
+        db.close()
+    await telemetry_buffer.start()
+    await tracking_hub.start()
+    await activity_tracker.start()
     yield
     # Shutdown: Cleanup if needed
     print("👋 Shutting down...")
+    await tracking_hub.stop()
+    await telemetry_buffer.stop()
+    print(f"📡 Telemetry buffer flushed ({telemetry_buffer.frames_written} frames written)")
+    await activity_tracker.stop()
+    print(f"🕒 Activity buffer flushed ({activity_tracker.rows_written} user rows written)")
+    shutdown_server_hash_pool()
 
 
 # Create FastAPI application
@@ -39,6 +80,20 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Sampled / on-demand request profiling (PROFILE_SAMPLE_RATE, X-Profile header)
+app.add_middleware(ProfilingMiddleware)
+
+# Replay responses for retried POSTs that carry an Idempotency-Key
+app.add_middleware(
+    IdempotencyMiddleware,
+    paths=[
+        "/auth/register",
+        "/auth/google",
+        "/auth/resend-otp",
+        "/auth/upload-avatar",
+    ],
+)
+
 # Configure CORS for mobile app
 app.add_middleware(
     CORSMiddleware,
@@ -53,6 +108,12 @@ app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 
 # Include routers
 app.include_router(auth_router)
+app.include_router(senders_router)
+app.include_router(telemetry_router)
+app.include_router(tracking_router)
+app.include_router(dispatch_router)
+app.include_router(users_router)
+app.include_router(internal_users_router)
 
 
 # ============ Health Endpoints ============
@@ -77,6 +138,34 @@ async def health_check():
     }
 
 
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """Admission control and cache counters for this worker"""
+    return {
+        "admission": {
+            bcrypt_admission.name: bcrypt_admission.stats(),
+            import_admission.name: import_admission.stats()
+        },
+        "user_lookup": user_lookup.stats()
+    }
+
+
+# ============ Well-Known Endpoints ============
+
+@app.get("/.well-known/jwks.json", tags=["Authentication"])
+async def jwks(request: Request):
+    """
+    Public JWT verification keys (JWK Set).
+    Other services cache this and verify access tokens locally by kid.
+    """
+    body, etag = key_ring.jwks_document()
+    headers = {"Cache-Control": "public, max-age=300", "ETag": etag}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 # ============ Development Helpers ============
 
 @app.get("/api/users", tags=["Development"])
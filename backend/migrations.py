@@ -0,0 +1,131 @@
+"""
+Schema Migrations for Horizn Backend
+Lightweight, ordered migrations for changes create_all() cannot apply
+to an existing database (new columns, backfills, extra indexes)
+"""
+from typing import Callable, List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+
+def _column_names(conn: Connection, table: str) -> set:
+    """Names of the columns currently present on a table"""
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+
+# ============ Migrations ============
+
+def add_users_row_version(conn: Connection) -> None:
+    """Row version counter used for ETags and optimistic concurrency"""
+    if "row_version" not in _column_names(conn, "users"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN row_version INTEGER NOT NULL DEFAULT 1"))
+
+
+def add_users_sender_queue(conn: Connection) -> None:
+    """Sender request timestamp and the review queue index"""
+    if "sender_requested_at" not in _column_names(conn, "users"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN sender_requested_at TIMESTAMP WITH TIME ZONE"))
+        # Existing pending requests keep their relative order via created_at
+        conn.execute(text(
+            "UPDATE users SET sender_requested_at = created_at "
+            "WHERE sender_request_status IS NOT NULL"
+        ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_users_sender_queue "
+        "ON users (sender_request_status, sender_requested_at, id)"
+    ))
+
+
+def add_users_activity(conn: Connection) -> None:
+    """Last login / last seen timestamps"""
+    columns = _column_names(conn, "users")
+    for column in ("last_login_at", "last_seen_at"):
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE users ADD COLUMN {column} TIMESTAMP WITH TIME ZONE"))
+
+
+def add_users_email_normalized(conn: Connection) -> None:
+    """
+    Case-normalized email with a unique index.
+    Where existing accounts differ only by case, the oldest keeps the
+    normalized email and the others are reported for a manual merge
+    (their email_normalized stays NULL, which the unique index allows).
+    """
+    from models import normalize_email
+
+    if "email_normalized" not in _column_names(conn, "users"):
+        conn.execute(text("ALTER TABLE users ADD COLUMN email_normalized VARCHAR(255)"))
+
+    seen = set()
+    updates = []
+    rows = conn.execute(text(
+        "SELECT id, email, email_normalized FROM users ORDER BY id"
+    ))
+    for user_id, email, current in rows:
+        normalized = normalize_email(email)
+        if normalized in seen:
+            print(f"⚠️  [MIGRATION] User {user_id} ({email}) duplicates an existing email when case-normalized")
+            continue
+        seen.add(normalized)
+        if current != normalized:
+            updates.append({"id": user_id, "email_normalized": normalized})
+
+    for start in range(0, len(updates), 1000):
+        conn.execute(
+            text("UPDATE users SET email_normalized = :email_normalized WHERE id = :id"),
+            updates[start:start + 1000]
+        )
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email_normalized ON users (email_normalized)"
+    ))
+
+
+def drop_bot_telemetry_user_fk(conn: Connection) -> None:
+    """
+    bot_telemetry.reported_by no longer references users, which may live
+    on another database when sharded. SQLite doesn't enforce the old
+    constraint, so only PostgreSQL needs it dropped.
+    """
+    if conn.dialect.name == "postgresql" and inspect(conn).has_table("bot_telemetry"):
+        conn.execute(text("ALTER TABLE bot_telemetry DROP CONSTRAINT IF EXISTS bot_telemetry_reported_by_fkey"))
+
+
+# Applied in order; names are recorded in schema_migrations once applied
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_users_row_version", add_users_row_version),
+    ("0002_users_sender_queue", add_users_sender_queue),
+    ("0003_users_activity", add_users_activity),
+    ("0004_users_email_normalized", add_users_email_normalized),
+    ("0005_bot_telemetry_user_fk", drop_bot_telemetry_user_fk),
+]
+
+
+def run_migrations(engine: Engine) -> List[str]:
+    """
+    Apply any migrations not yet recorded in schema_migrations.
+    Each migration is idempotent, so a database freshly created by
+    create_all() simply has every migration marked as applied.
+
+    Returns:
+        Names of the migrations applied by this call
+    """
+    applied_now = []
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "name VARCHAR(100) PRIMARY KEY, "
+            "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+
+    for name, migration in MIGRATIONS:
+        if name in applied:
+            continue
+        with engine.begin() as conn:
+            migration(conn)
+            conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
+        applied_now.append(name)
+
+    return applied_now
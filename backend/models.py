@@ -1,19 +1,42 @@
 """
 Database Models for Horizn Backend
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Enum as SQLEnum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, LargeBinary, Text, Enum as SQLEnum
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql import func
 from database import Base
 import enum
 
 
+def normalize_email(email: str) -> str:
+    """Canonical form of an email for uniqueness checks and lookups"""
+    return email.strip().lower()
+
+
 class AuthProvider(enum.Enum):
     """Authentication provider types"""
     EMAIL = "email"
     GOOGLE = "google"
 
 
+class SenderRequestStatus(enum.Enum):
+    """Sender access request states"""
+    PENDING = "pending"
+    APPROVED = "approved"
+    REJECTED = "rejected"
+
+
+class BotStatus(enum.Enum):
+    """Delivery bot operating states reported in telemetry"""
+    IDLE = "idle"
+    EN_ROUTE = "en_route"
+    DELIVERING = "delivering"
+    RETURNING = "returning"
+    CHARGING = "charging"
+    ERROR = "error"
+    OFFLINE = "offline"
+
+
 class VerificationType(enum.Enum):
     """Types of verification codes"""
     EMAIL_VERIFICATION = "email_verification"
@@ -26,6 +49,7 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
+    email_normalized = Column(String(255), unique=True, index=True, nullable=True)  # Set from email
     password_hash = Column(String(255), nullable=True)  # Nullable for OAuth users
     first_name = Column(String(100), nullable=False)
     last_name = Column(String(100), nullable=False)
@@ -40,6 +64,7 @@ class User(Base):
     # Sender access
     is_sender = Column(Boolean, default=False)
     sender_request_status = Column(String(20), nullable=True)  # pending, approved, rejected
+    sender_requested_at = Column(DateTime(timezone=True), nullable=True)
     
     # Auth provider
     auth_provider = Column(String(20), default="email")
@@ -49,9 +74,27 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Activity (written in bulk by auth.activity, not per request)
+    last_login_at = Column(DateTime(timezone=True), nullable=True)
+    last_seen_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Incremented on every ORM update; used for ETags and optimistic concurrency
+    row_version = Column(Integer, nullable=False, default=1)
+
     # Relationships
     verification_codes = relationship("VerificationCode", back_populates="user", cascade="all, delete-orphan")
 
+    @validates("email")
+    def _set_email_normalized(self, key, email):
+        self.email_normalized = normalize_email(email) if email is not None else None
+        return email
+
+    __table_args__ = (
+        # Review queue: WHERE status = ? ORDER BY requested_at, id (keyset pagination)
+        Index("ix_users_sender_queue", "sender_request_status", "sender_requested_at", "id"),
+    )
+    __mapper_args__ = {"version_id_col": row_version}
+
 
 class VerificationCode(Base):
     """Verification codes for email verification and password reset"""
@@ -67,3 +110,37 @@ class VerificationCode(Base):
 
     # Relationships
     user = relationship("User", back_populates="verification_codes")
+
+
+class BotTelemetry(Base):
+    """Position, battery and status frames streamed by delivery bots"""
+    __tablename__ = "bot_telemetry"
+
+    id = Column(Integer, primary_key=True)
+    bot_id = Column(String(64), nullable=False)
+    reported_by = Column(Integer, nullable=True)  # users.id of an admin streaming; NULL for bot tokens (no FK: users may be sharded)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+    battery = Column(Float, nullable=False)  # Percent
+    status = Column(String(20), nullable=False)  # idle, en_route, delivering, ...
+    delivery_id = Column(String(64), nullable=True)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)  # Bot clock
+    received_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Latest frames per bot: WHERE bot_id = ? ORDER BY recorded_at DESC
+        Index("ix_bot_telemetry_bot_recorded", "bot_id", "recorded_at"),
+    )
+
+
+class IdempotencyKey(Base):
+    """Stored responses for Idempotency-Key retries (shared backend)"""
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(64), primary_key=True)  # sha256 of path, caller and client key
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request body
+    status_code = Column(Integer, nullable=True)  # NULL while the first request is running
+    headers = Column(Text, nullable=True)  # JSON list of [name, value]
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,242 @@
+"""
+Request Profiling for Horizn Backend
+Opt-in sampling profiles of individual requests, written as speedscope files
+
+Requests are profiled when either:
+    - a random draw falls under PROFILE_SAMPLE_RATE (0.0 disables), or
+    - they carry ``X-Profile: <PROFILE_DEBUG_TOKEN>`` (disabled if unset)
+
+Aggregate captured profiles by route:
+    python -m profiling --dir profiles --top 25
+    python -m profiling --dir profiles --route /auth/login --folded out/
+"""
+import argparse
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.0"))
+PROFILE_DEBUG_TOKEN = os.getenv("PROFILE_DEBUG_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(__file__), "profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "500"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.001"))
+
+PROFILE_SUFFIX = ".speedscope.json"
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that runs selected requests under pyinstrument.
+
+    pyinstrument's async mode follows the request's own task, so
+    concurrent requests don't leak into each other's profile; time spent
+    awaiting (DB, threadpool bcrypt) shows up at the await site. Files are
+    named by time, method, route template, status and duration, and the
+    oldest are deleted beyond PROFILE_MAX_FILES.
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        debug_token: Optional[str] = PROFILE_DEBUG_TOKEN,
+        output_dir: str = PROFILE_DIR,
+        max_files: int = PROFILE_MAX_FILES,
+        interval: float = PROFILE_INTERVAL_SECONDS
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.debug_token = debug_token.encode() if debug_token else None
+        self.output_dir = output_dir
+        self.max_files = max_files
+        self.interval = interval
+
+    def _should_profile(self, scope) -> Tuple[bool, bool]:
+        """Whether to profile, and whether it was requested via the debug header"""
+        if self.debug_token:
+            header = dict(scope["headers"]).get(b"x-profile")
+            if header is not None and hmac.compare_digest(header, self.debug_token):
+                return True, True
+        return self.sample_rate > 0 and random.random() < self.sample_rate, False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile, requested = self._should_profile(scope)
+        if not profile:
+            await self.app(scope, receive, send)
+            return
+
+        from pyinstrument import Profiler
+
+        status_code = 500
+        # Sorts chronologically, which rotation relies on
+        capture_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{random.getrandbits(32):08x}"
+
+        async def profiled_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if requested:
+                    # Lets the caller find the capture among the files
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-id", capture_id.encode())
+                    ]
+            await send(message)
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        started = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, profiled_send)
+        finally:
+            profiler.stop()
+            duration_ms = (time.perf_counter() - started) * 1000
+            # Routing has run by now, so group by template rather than raw path
+            route = getattr(scope.get("route"), "path", None) or scope["path"]
+            name = f"{capture_id}__{scope['method']}__{route_slug(route)}__{status_code}__{duration_ms:.0f}ms"
+            await asyncio.to_thread(self._write, profiler, name, route, scope["method"])
+
+    def _write(self, profiler, name: str, route: str, method: str) -> None:
+        """Write the speedscope file and rotate old captures"""
+        from pyinstrument.renderers import SpeedscopeRenderer
+
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            document = json.loads(profiler.output(renderer=SpeedscopeRenderer()))
+            document["name"] = f"{method} {route}"
+            document["horizn"] = {"route": route, "method": method}
+            with open(os.path.join(self.output_dir, name + PROFILE_SUFFIX), "w") as f:
+                json.dump(document, f)
+            self._rotate()
+        except Exception as e:
+            print(f"❌ [PROFILE] Failed to write profile {name}: {type(e).__name__}: {e}")
+
+    def _rotate(self) -> None:
+        files = sorted(f for f in os.listdir(self.output_dir) if f.endswith(PROFILE_SUFFIX))
+        for old in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.output_dir, old))
+            except FileNotFoundError:
+                pass
+
+
+def route_slug(route: str) -> str:
+    """Filesystem-safe form of a route template"""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", route.strip("/")) or "root"
+
+
+# ============ Aggregation CLI ============
+
+def load_profile(path: str) -> Tuple[str, float, Dict[Tuple[str, ...], float]]:
+    """
+    Read a speedscope file into (route key, duration, collapsed stacks).
+    Collapsed stacks map a tuple of frame names (root first) to self time.
+    """
+    with open(path) as f:
+        document = json.load(f)
+
+    meta = document.get("horizn", {})
+    route_key = f"{meta.get('method', '?')} {meta.get('route', '?')}"
+    frames = document["shared"]["frames"]
+    labels = [
+        f"{frame['name']} ({os.path.basename(frame['file'])}:{frame.get('line')})" if frame.get("file") else frame["name"]
+        for frame in frames
+    ]
+
+    stacks: Dict[Tuple[str, ...], float] = defaultdict(float)
+    duration = 0.0
+    for profile in document["profiles"]:
+        duration += profile["endValue"] - profile["startValue"]
+        stack: List[int] = []
+        last = profile["startValue"]
+        for event in profile["events"]:
+            if stack:
+                stacks[tuple(labels[i] for i in stack)] += event["at"] - last
+            last = event["at"]
+            if event["type"] == "O":
+                stack.append(event["frame"])
+            elif stack:
+                stack.pop()
+    return route_key, duration, stacks
+
+
+def aggregate(directory: str, route_filter: Optional[str] = None):
+    """Merge all profiles in a directory by route"""
+    routes = defaultdict(lambda: {"count": 0, "duration": 0.0, "stacks": defaultdict(float)})
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(PROFILE_SUFFIX):
+            continue
+        try:
+            route_key, duration, stacks = load_profile(os.path.join(directory, filename))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Skipping {filename}: {type(e).__name__}: {e}")
+            continue
+        if route_filter and not route_key.endswith(" " + route_filter):
+            continue
+        entry = routes[route_key]
+        entry["count"] += 1
+        entry["duration"] += duration
+        for stack, seconds in stacks.items():
+            entry["stacks"][stack] += seconds
+    return routes
+
+
+def main():
+    """Aggregate captured profiles by route"""
+    parser = argparse.ArgumentParser(description="Aggregate Horizn request profiles by route")
+    parser.add_argument("--dir", default=PROFILE_DIR, help="Directory of .speedscope.json captures")
+    parser.add_argument("--route", help="Only this route template, e.g. /auth/login")
+    parser.add_argument("--top", type=int, default=20, help="Frames to list per route")
+    parser.add_argument("--folded", help="Also write <route>.folded collapsed stacks (flamegraph.pl / speedscope) here")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.dir):
+        parser.error(f"No profile directory at {args.dir}")
+
+    routes = aggregate(args.dir, args.route)
+    if not routes:
+        print("No profiles found")
+        return
+
+    for route_key, entry in sorted(routes.items(), key=lambda item: -item[1]["duration"]):
+        total = entry["duration"] or 1e-9
+        self_time: Dict[str, float] = defaultdict(float)
+        inclusive: Dict[str, float] = defaultdict(float)
+        for stack, seconds in entry["stacks"].items():
+            self_time[stack[-1]] += seconds
+            for label in set(stack):
+                inclusive[label] += seconds
+
+        print(f"\n=== {route_key}: {entry['count']} requests, mean {total / entry['count'] * 1000:.1f}ms ===")
+        print(f"{'self %':>7} {'total %':>8}  frame")
+        for label, seconds in sorted(self_time.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"{seconds / total * 100:>6.1f}% {inclusive[label] / total * 100:>7.1f}%  {label}")
+
+        if args.folded:
+            os.makedirs(args.folded, exist_ok=True)
+            path = os.path.join(args.folded, route_slug(route_key) + ".folded")
+            with open(path, "w") as f:
+                for stack, seconds in entry["stacks"].items():
+                    # Microsecond sample weights; ';' separates frames in this format
+                    f.write(";".join(label.replace(";", ":") for label in stack) + f" {max(1, round(seconds * 1e6))}\n")
+            print(f"📄 Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Senders module
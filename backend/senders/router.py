@@ -0,0 +1,181 @@
+"""
+Sender Access Router for Horizn Backend
+Request, review and bulk-approve sender access
+"""
+import base64
+from datetime import datetime
+from typing import Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import User, SenderRequestStatus
+from auth.utils import get_current_active_user
+from auth.permissions import UserPermissions, invalidate_user_permissions, require_admin
+from users.lookup import user_lookup
+from senders.schemas import (
+    SenderDecision,
+    SenderStatusResponse,
+    SenderRequestItem,
+    SenderRequestPage,
+    SenderDecisionResponse
+)
+
+router = APIRouter(prefix="/senders", tags=["Senders"])
+
+# Review queue page size limits
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+# ============ Helper Functions ============
+
+def encode_cursor(requested_at: datetime, user_id: int) -> str:
+    """Encode the last row's sort key as an opaque cursor"""
+    raw = f"{requested_at.isoformat()}|{user_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        requested_at, user_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(requested_at), int(user_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+# ============ Endpoints ============
+
+@router.post("/request", response_model=SenderStatusResponse)
+async def request_sender_access(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Request sender access for the current user.
+    Repeating a pending request is a no-op.
+    """
+    if current_user.is_sender:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sender access already granted"
+        )
+
+    if current_user.sender_request_status != SenderRequestStatus.PENDING.value:
+        current_user.sender_request_status = SenderRequestStatus.PENDING.value
+        current_user.sender_requested_at = datetime.utcnow()
+        db.commit()
+        db.refresh(current_user)
+        print(f"\n📨 [DEV] Sender access requested by {current_user.email}\n")
+
+    return SenderStatusResponse.model_validate(current_user)
+
+
+@router.get("/request", response_model=SenderStatusResponse)
+async def get_sender_status(current_user: User = Depends(get_current_active_user)):
+    """
+    Get the current user's sender access status.
+    """
+    return SenderStatusResponse.model_validate(current_user)
+
+
+@router.get("/requests", response_model=SenderRequestPage)
+async def list_sender_requests(
+    request_status: Literal["pending", "approved", "rejected"] = Query(SenderRequestStatus.PENDING.value, alias="status"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    admin: UserPermissions = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    [ADMIN] Review queue of sender requests, oldest first.
+    Keyset-paginated on (sender_requested_at, id) so every page is an
+    index range scan regardless of queue depth; pass next_cursor back
+    to fetch the following page.
+    """
+    query = db.query(
+        User.id,
+        User.email,
+        User.first_name,
+        User.last_name,
+        User.sender_request_status,
+        User.sender_requested_at
+    ).filter(User.sender_request_status == request_status)
+
+    if cursor:
+        after_time, after_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            User.sender_requested_at > after_time,
+            and_(User.sender_requested_at == after_time, User.id > after_id)
+        ))
+
+    # Fetch one extra row to know whether another page exists. With sharded
+    # users each shard returns its own first page, so merge them by sort key.
+    rows = query.order_by(User.sender_requested_at, User.id).limit(limit + 1).all()
+    rows = sorted(rows, key=lambda row: (row.sender_requested_at, row.id))[:limit + 1]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    items = [
+        SenderRequestItem(
+            user_id=row.id,
+            email=row.email,
+            first_name=row.first_name,
+            last_name=row.last_name,
+            sender_request_status=row.sender_request_status,
+            sender_requested_at=row.sender_requested_at
+        )
+        for row in rows
+    ]
+    next_cursor = encode_cursor(rows[-1].sender_requested_at, rows[-1].id) if has_more else None
+
+    return SenderRequestPage(items=items, next_cursor=next_cursor)
+
+
+@router.post("/requests/decision", response_model=SenderDecisionResponse)
+async def decide_sender_requests(
+    data: SenderDecision,
+    admin: UserPermissions = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    [ADMIN] Approve or reject many pending sender requests at once.
+    Applied as a single UPDATE; IDs that are not pending are skipped.
+    """
+    user_ids = set(data.user_ids)
+    approved = data.decision == SenderRequestStatus.APPROVED.value
+
+    stmt = (
+        update(User)
+        .where(
+            User.id.in_(user_ids),
+            User.sender_request_status == SenderRequestStatus.PENDING.value
+        )
+        .values(
+            sender_request_status=data.decision,
+            is_sender=approved,
+            row_version=User.row_version + 1,
+            updated_at=func.now()
+        )
+        .returning(User.id)
+        .execution_options(synchronize_session=False)
+    )
+    updated = sorted(db.execute(stmt).scalars().all())
+    db.commit()
+
+    invalidate_user_permissions(updated)
+    user_lookup.invalidate(updated)
+    print(f"\n✅ [DEV] Sender requests {data.decision}: {len(updated)} users\n")
+
+    return SenderDecisionResponse(
+        decision=data.decision,
+        updated=updated,
+        skipped=sorted(user_ids.difference(updated))
+    )
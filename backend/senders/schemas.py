@@ -0,0 +1,53 @@
+"""
+Pydantic Schemas for Sender Access
+Request/Response models for sender request endpoints
+"""
+from datetime import datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+
+# Maximum number of users in one bulk decision
+MAX_DECISION_BATCH = 1000
+
+
+# ============ Request Schemas ============
+
+class SenderDecision(BaseModel):
+    """Schema for approving or rejecting many sender requests at once"""
+    user_ids: List[int] = Field(..., min_length=1, max_length=MAX_DECISION_BATCH)
+    decision: Literal["approved", "rejected"]
+
+
+# ============ Response Schemas ============
+
+class SenderStatusResponse(BaseModel):
+    """Schema for a user's own sender access status"""
+    is_sender: bool
+    sender_request_status: Optional[str] = None
+    sender_requested_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class SenderRequestItem(BaseModel):
+    """Schema for one entry in the review queue"""
+    user_id: int
+    email: str
+    first_name: str
+    last_name: str
+    sender_request_status: str
+    sender_requested_at: datetime
+
+
+class SenderRequestPage(BaseModel):
+    """Schema for a page of the review queue"""
+    items: List[SenderRequestItem]
+    next_cursor: Optional[str] = None
+
+
+class SenderDecisionResponse(BaseModel):
+    """Result of a bulk decision"""
+    decision: str
+    updated: List[int]
+    skipped: List[int] = Field(default_factory=list, description="IDs that were not pending")
@@ -0,0 +1,464 @@
+"""
+Database Sharding for Horizn Backend
+Routes users and verification codes across several databases
+
+Enabled by setting DATABASE_SHARD_URLS, e.g.
+    DATABASE_SHARD_URLS=shard0=sqlite:///./users0.db,shard1=sqlite:///./users1.db
+
+DATABASE_URL remains the primary database: every other table lives there,
+together with user_directory, which hands out globally unique user ids
+and maps normalized emails to them. A user (and their verification
+codes) lives on the shard chosen by a consistent hash of the user id, so
+adding a shard moves only about 1/N of the users.
+
+Usage:
+    python -m sharding status
+    python -m sharding sync-directory --from legacy=sqlite:///./horizn.db
+    python -m sharding reshard --from shard0=sqlite:///./users0.db,shard1=sqlite:///./users1.db
+
+To enable sharding on an existing single database, run sync-directory
+then reshard with ``--from`` pointing at the old DATABASE_URL. To add a
+shard, append it to DATABASE_SHARD_URLS (keeping existing names) and run
+reshard with ``--from`` set to the previous list. Run reshard with writes
+paused: a user is not found until they reach their new shard.
+"""
+import argparse
+import bisect
+import hashlib
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, delete, event, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import ORMExecuteState
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList, ColumnClause
+from sqlalchemy.sql.util import find_tables
+
+from cache import TTLCache
+
+# Configuration
+SHARD_VIRTUAL_NODES = int(os.getenv("SHARD_VIRTUAL_NODES", "64"))
+DIRECTORY_CACHE_TTL_SECONDS = int(os.getenv("DIRECTORY_CACHE_TTL_SECONDS", "3600"))
+
+PRIMARY_SHARD = "primary"
+SHARDED_TABLES = ("users", "verification_codes")
+
+# Only ever created on the primary, so it is kept out of Base.metadata
+directory_metadata = MetaData()
+user_directory = Table(
+    "user_directory",
+    directory_metadata,
+    Column("id", Integer, primary_key=True),  # The user's id on whichever shard holds them
+    Column("email_normalized", String(255), nullable=False, unique=True),
+)
+
+
+class ShardRoutingError(Exception):
+    """A statement touches sharded tables but names no user to route by"""
+
+
+def parse_shard_urls(value: str) -> Dict[str, str]:
+    """
+    Parse ``name=url,name=url`` (or bare urls, named shard0, shard1, ...).
+    Names must stay stable across reconfigurations, since they are hashed.
+    """
+    shards: Dict[str, str] = {}
+    for index, item in enumerate(part.strip() for part in value.split(",")):
+        if not item:
+            continue
+        name, sep, url = item.partition("=")
+        if not sep or "://" in name:
+            name, url = f"shard{index}", item
+        shards[name.strip()] = url.strip()
+    return shards
+
+
+def create_db_engine(url: str) -> Engine:
+    """Engine with the same per-dialect settings as the primary"""
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False})  # Required for SQLite
+    return create_engine(url)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes per shard"""
+
+    def __init__(self, shard_ids: Iterable[str], vnodes: int = SHARD_VIRTUAL_NODES):
+        points = sorted((_hash(f"{shard_id}#{i}"), shard_id) for shard_id in shard_ids for i in range(vnodes))
+        if not points:
+            raise ValueError("A hash ring needs at least one shard")
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard_id for _, shard_id in points]
+
+    def shard_for(self, key: int) -> str:
+        index = bisect.bisect(self._hashes, _hash(str(key))) % len(self._hashes)
+        return self._shards[index]
+
+
+class ShardRouter:
+    """
+    Decides which database each statement runs on, for use with
+    SQLAlchemy's ShardedSession.
+
+    Users are routed by id; queries filtering on users.id,
+    users.email_normalized (through the directory) or
+    verification_codes.user_id go to the matching shards only, anything
+    else on those tables is run on every shard and the results are
+    concatenated. All other tables go to the primary.
+    """
+
+    def __init__(self, primary: Engine, shards: Dict[str, Engine], vnodes: int = SHARD_VIRTUAL_NODES):
+        if PRIMARY_SHARD in shards:
+            raise ValueError(f"'{PRIMARY_SHARD}' is reserved for the primary database")
+        self.primary = primary
+        self.shards = shards
+        self.ring = HashRing(shards, vnodes)
+        # normalized email -> user id; ids never change, so entries stay valid
+        self.directory_cache = TTLCache(maxsize=200000, ttl=DIRECTORY_CACHE_TTL_SECONDS)
+
+    # ============ Placement ============
+
+    def shard_for_user(self, user_id: int) -> str:
+        return self.ring.shard_for(user_id)
+
+    def lookup_user_ids(self, emails: Iterable[str]) -> Dict[str, int]:
+        """Resolve normalized emails to user ids; unknown emails are absent"""
+        found: Dict[str, int] = {}
+        missing: List[str] = []
+        for email in set(emails):
+            user_id = self.directory_cache.get(email)
+            if user_id is None:
+                missing.append(email)
+            else:
+                found[email] = user_id
+
+        if missing:
+            with self.primary.connect() as conn:
+                rows = conn.execute(
+                    select(user_directory.c.email_normalized, user_directory.c.id)
+                    .where(user_directory.c.email_normalized.in_(missing))
+                ).all()
+            for email, user_id in rows:
+                self.directory_cache.set(email, user_id)
+                found[email] = user_id
+        return found
+
+    def allocate_user_ids(self, conn: Connection, emails: List[str]) -> Dict[str, int]:
+        """
+        Claim ids for new users in the directory, on the caller's primary
+        connection so they roll back with the rest of the transaction.
+
+        Raises:
+            IntegrityError: If an email is already registered
+        """
+        rows = conn.execute(
+            insert(user_directory).returning(user_directory.c.email_normalized, user_directory.c.id),
+            [{"email_normalized": email} for email in emails]
+        ).all()
+        return dict(rows)
+
+    # ============ ShardedSession hooks ============
+
+    @staticmethod
+    def _sharded_table(mapper) -> Optional[str]:
+        name = getattr(getattr(mapper, "local_table", None), "name", None)
+        return name if name in SHARDED_TABLES else None
+
+    def shard_chooser(self, mapper, instance, clause=None) -> str:
+        """Shard for a new object, or for a statement with no ORM entity"""
+        table = self._sharded_table(mapper)
+        if table is None:
+            if clause is not None and any(t.name in SHARDED_TABLES for t in find_tables(clause, include_crud=True)):
+                raise ShardRoutingError("Pass bind_arguments={'shard_id': ...} for statements on sharded tables")
+            return PRIMARY_SHARD
+        if instance is None:
+            raise ShardRoutingError(f"Cannot route a statement on {table} without a user id")
+        if table == "users":
+            return self.shard_for_user(instance.id)
+        user_id = instance.user_id if instance.user_id is not None else instance.user.id
+        return self.shard_for_user(user_id)
+
+    def identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, **kw) -> List[str]:
+        """Shards to search for an object by primary key"""
+        if lazy_loaded_from is not None:
+            return [lazy_loaded_from.identity_token]
+        table = self._sharded_table(mapper)
+        if table == "users":
+            return [self.shard_for_user(primary_key[0])]
+        if table is not None:
+            return list(self.shards)
+        return [PRIMARY_SHARD]
+
+    def execute_chooser(self, context: ORMExecuteState) -> List[str]:
+        """Shards to run an ORM SELECT / UPDATE / DELETE on"""
+        if context.is_select and context.lazy_loaded_from is not None:
+            return [context.lazy_loaded_from.identity_token]
+        table = self._sharded_table(context.bind_mapper)
+        if table is None:
+            return [PRIMARY_SHARD]
+
+        user_ids = self._user_ids_in_criteria(context.statement)
+        if user_ids is None:
+            return list(self.shards)
+        # No matching user anywhere: one shard answers just as well as all
+        return sorted({self.shard_for_user(user_id) for user_id in user_ids}) or [next(iter(self.shards))]
+
+    def _user_ids_in_criteria(self, statement) -> Optional[Set[int]]:
+        """
+        User ids pinned by the WHERE clause, or None if it doesn't pin any.
+        Only top-level AND terms count; an OR could match other users.
+        """
+        whereclause = getattr(statement, "whereclause", None)
+        if whereclause is None:
+            return None
+
+        for term in _conjuncts(whereclause):
+            if not (
+                isinstance(term, BinaryExpression)
+                and term.operator in (operators.eq, operators.in_op)
+                and isinstance(term.left, ColumnClause)
+                and isinstance(term.right, BindParameter)
+            ):
+                continue
+            value = term.right.effective_value
+            values = list(value) if term.operator is operators.in_op else [value]
+            column = (getattr(term.left.table, "name", None), term.left.name)
+
+            if column in (("users", "id"), ("verification_codes", "user_id")):
+                return {int(user_id) for user_id in values}
+            if column == ("users", "email_normalized"):
+                return set(self.lookup_user_ids(values).values())
+        return None
+
+    def assign_user_ids(self, session, flush_context, instances) -> None:
+        """before_flush: give new users a directory id so they can be placed"""
+        new_users = [
+            obj for obj in session.new
+            if self._sharded_table(inspect(obj).mapper) == "users" and obj.id is None
+        ]
+        if not new_users:
+            return
+        conn = session.connection(bind_arguments={"shard_id": PRIMARY_SHARD})
+        ids = self.allocate_user_ids(conn, [user.email_normalized for user in new_users])
+        for user in new_users:
+            user.id = ids[user.email_normalized]
+
+    def create_session_class(self):
+        """ShardedSession subclass wired to this router"""
+        router = self
+
+        class RoutedSession(ShardedSession):
+            def __init__(self, **kwargs):
+                super().__init__(
+                    shard_chooser=router.shard_chooser,
+                    identity_chooser=router.identity_chooser,
+                    execute_chooser=router.execute_chooser,
+                    shards={PRIMARY_SHARD: router.primary, **router.shards},
+                    **kwargs
+                )
+
+        event.listen(RoutedSession, "before_flush", router.assign_user_ids)
+        return RoutedSession
+
+    # ============ Schema ============
+
+    def create_schema(self, metadata: MetaData) -> List[str]:
+        """
+        Create the directory on the primary and the sharded tables (with
+        their migrations) on every shard.
+
+        Returns:
+            Names of migrations applied, prefixed by shard
+        """
+        from migrations import run_migrations
+
+        directory_metadata.create_all(self.primary)
+        tables = [metadata.tables[name] for name in SHARDED_TABLES]
+        applied = []
+        for shard_id, engine in self.shards.items():
+            metadata.create_all(engine, tables=tables)
+            applied.extend(f"{shard_id}:{name}" for name in run_migrations(engine))
+        return applied
+
+
+def _conjuncts(clause):
+    if isinstance(clause, BooleanClauseList) and clause.operator is operators.and_:
+        for child in clause.clauses:
+            yield from _conjuncts(child)
+    else:
+        yield clause
+
+
+# ============ Maintenance CLI ============
+
+def _table(engine: Engine, name: str) -> Table:
+    return Table(name, MetaData(), autoload_with=engine)
+
+
+def status(router: ShardRouter) -> None:
+    """Users per shard and how many are not where the ring puts them"""
+    for shard_id, engine in router.shards.items():
+        users = _table(engine, "users")
+        total = misplaced = 0
+        with engine.connect() as conn:
+            for (user_id,) in conn.execute(select(users.c.id)):
+                total += 1
+                misplaced += router.shard_for_user(user_id) != shard_id
+        print(f"{shard_id:>12}: {total} users, {misplaced} misplaced  ({engine.url})")
+
+    with router.primary.connect() as conn:
+        entries = conn.execute(select(user_directory.c.id)).all()
+    print(f"{'directory':>12}: {len(entries)} entries  ({router.primary.url})")
+
+
+def sync_directory(router: ShardRouter, sources: Dict[str, Engine], batch_size: int) -> int:
+    """Add directory entries for users that have none (e.g. pre-sharding users)"""
+    directory_metadata.create_all(router.primary)
+    added = 0
+    for source_id, engine in sources.items():
+        users = _table(engine, "users")
+        with engine.connect() as source:
+            rows = source.execute(
+                select(users.c.id, users.c.email_normalized)
+                .where(users.c.email_normalized.isnot(None))
+                .order_by(users.c.id)
+                .execution_options(yield_per=batch_size)
+            )
+            for batch in rows.partitions():
+                with router.primary.begin() as conn:
+                    known = set(conn.execute(
+                        select(user_directory.c.id).where(user_directory.c.id.in_([row.id for row in batch]))
+                    ).scalars())
+                    new_rows = [
+                        {"id": row.id, "email_normalized": row.email_normalized}
+                        for row in batch if row.id not in known
+                    ]
+                    if new_rows:
+                        conn.execute(insert(user_directory), new_rows)
+                        added += len(new_rows)
+        print(f"📇 {source_id}: directory synced")
+
+    if router.primary.dialect.name == "postgresql":
+        # Explicit ids don't advance the sequence; new users must start above them
+        with router.primary.begin() as conn:
+            conn.execute(text(
+                "SELECT setval(pg_get_serial_sequence('user_directory', 'id'), "
+                "(SELECT COALESCE(MAX(id), 1) FROM user_directory))"
+            ))
+    return added
+
+
+def reshard(router: ShardRouter, sources: Dict[str, Engine], batch_size: int, dry_run: bool = False) -> int:
+    """
+    Move every user in ``sources`` whose ring shard is not the source
+    shard, with their verification codes. Sources are matched to shards
+    by name, never by URL. Copies then deletes, one batch per transaction
+    pair: only users this run inserted into the target are deleted from
+    the source, so a user that is already there (the same database under
+    another name, or a copy left by an earlier run) is never removed.
+
+    Returns:
+        Number of users moved
+    """
+    moved = 0
+    for source_id, source_engine in sources.items():
+        users = _table(source_engine, "users")
+        codes = _table(source_engine, "verification_codes")
+        last_id = 0
+        while True:
+            with source_engine.connect() as source:
+                batch = source.execute(
+                    select(users).where(users.c.id > last_id).order_by(users.c.id).limit(batch_size)
+                ).mappings().all()
+            if not batch:
+                break
+            last_id = batch[-1]["id"]
+
+            by_target: Dict[str, List[dict]] = {}
+            for row in batch:
+                target_id = router.shard_for_user(row["id"])
+                if target_id != source_id:
+                    by_target.setdefault(target_id, []).append(dict(row))
+            if dry_run:
+                moved += sum(len(rows) for rows in by_target.values())
+                continue
+
+            for target_id, rows in by_target.items():
+                user_ids = [row["id"] for row in rows]
+                with source_engine.connect() as source:
+                    code_rows = [
+                        {key: value for key, value in code.items() if key != "id"}
+                        for code in source.execute(select(codes).where(codes.c.user_id.in_(user_ids))).mappings()
+                    ]
+
+                target_engine = router.shards[target_id]
+                target_users = _table(target_engine, "users")
+                with target_engine.begin() as target:
+                    present = set(target.execute(
+                        select(target_users.c.id).where(target_users.c.id.in_(user_ids))
+                    ).scalars())
+                    new_rows = [row for row in rows if row["id"] not in present]
+                    copied_ids = [row["id"] for row in new_rows]
+                    if new_rows:
+                        target.execute(insert(target_users), new_rows)
+                        copied = set(copied_ids)
+                        new_codes = [code for code in code_rows if code["user_id"] in copied]
+                        if new_codes:
+                            target.execute(insert(_table(target_engine, "verification_codes")), new_codes)
+
+                if present:
+                    print(f"⚠️  {source_id} -> {target_id}: {len(present)} users already on target, left in place")
+                if not copied_ids:
+                    continue
+                with source_engine.begin() as source:
+                    source.execute(delete(codes).where(codes.c.user_id.in_(copied_ids)))
+                    source.execute(delete(users).where(users.c.id.in_(copied_ids)))
+                moved += len(copied_ids)
+                print(f"🚚 {source_id} -> {target_id}: {len(copied_ids)} users")
+    return moved
+
+
+def main():
+    """Inspect and rebalance user shards"""
+    from database import shard_router
+
+    parser = argparse.ArgumentParser(description="Maintain user shards (DATABASE_SHARD_URLS)")
+    parser.add_argument("command", choices=["status", "sync-directory", "reshard"])
+    parser.add_argument("--from", dest="sources", help="Source databases as name=url,... (default: current shards)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="reshard: count users to move without moving them")
+    args = parser.parse_args()
+
+    if shard_router is None:
+        parser.error("Sharding is not enabled; set DATABASE_SHARD_URLS")
+
+    if args.sources:
+        sources = {name: create_db_engine(url) for name, url in parse_shard_urls(args.sources).items()}
+    else:
+        sources = dict(shard_router.shards)
+
+    if args.command == "status":
+        status(shard_router)
+    elif args.command == "sync-directory":
+        try:
+            added = sync_directory(shard_router, sources, args.batch_size)
+        except IntegrityError as e:
+            parser.error(f"Directory conflict (same email under two ids?): {e.orig}")
+        print(f"✅ Added {added} directory entries")
+    else:
+        import models  # noqa: F401  Registers the tables on Base.metadata
+        from database import Base
+        shard_router.create_schema(Base.metadata)
+        moved = reshard(shard_router, sources, args.batch_size, args.dry_run)
+        print(f"✅ {'Would move' if args.dry_run else 'Moved'} {moved} users")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Telemetry Write Buffer for Horizn Backend
+Batches bot frames in memory and flushes them with bulk inserts
+"""
+import asyncio
+import os
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+from sharding import PRIMARY_SHARD
+
+from database import SessionLocal
+from models import BotTelemetry
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+TELEMETRY_BUFFER_SIZE = int(os.getenv("TELEMETRY_BUFFER_SIZE", "50000"))
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "2000"))
+TELEMETRY_FLUSH_INTERVAL_SECONDS = float(os.getenv("TELEMETRY_FLUSH_INTERVAL_SECONDS", "1.0"))
+
+
+class TelemetryBuffer:
+    """
+    Bounded in-memory queue of telemetry rows with a background flusher.
+
+    Rows are written once ``batch_size`` have accumulated or
+    ``flush_interval`` seconds after the first row of a batch arrived,
+    whichever comes first. When the queue is full, ``put`` waits, which
+    stops the WebSocket handler reading and pushes back on the bot.
+    """
+
+    def __init__(
+        self,
+        capacity: int = TELEMETRY_BUFFER_SIZE,
+        batch_size: int = TELEMETRY_BATCH_SIZE,
+        flush_interval: float = TELEMETRY_FLUSH_INTERVAL_SECONDS
+    ):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[dict] = []
+        self.frames_received = 0
+        self.frames_written = 0
+        self.frames_failed = 0
+        self.flushes = 0
+        self.backpressure_waits = 0
+
+    async def start(self) -> None:
+        """Start the background flusher (call from the running event loop)"""
+        self._queue = asyncio.Queue(maxsize=self.capacity)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write everything still buffered"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        remaining = self._batch
+        self._batch = []
+        while not self._queue.empty():
+            remaining.append(self._queue.get_nowait())
+        for start in range(0, len(remaining), self.batch_size):
+            await asyncio.to_thread(self._write, remaining[start:start + self.batch_size])
+
+    async def put(self, row: dict) -> None:
+        """Queue a row, waiting for space if the buffer is full"""
+        if self._queue.full():
+            self.backpressure_waits += 1
+        await self._queue.put(row)
+        self.frames_received += 1
+
+    def __len__(self) -> int:
+        return (self._queue.qsize() if self._queue else 0) + len(self._batch)
+
+    async def _run(self) -> None:
+        """Collect batches on a size/time trigger and write them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval
+
+            while len(self._batch) < self.batch_size:
+                try:
+                    self._batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._batch = self._batch, []
+            await asyncio.to_thread(self._write, batch)
+
+    def _write(self, rows: List[dict]) -> None:
+        """Insert rows as one multi-row INSERT (runs in a worker thread)"""
+        if not rows:
+            return
+        db = SessionLocal()
+        try:
+            # Table-level insert with an explicit bind: a sharded session
+            # can't route ORM bulk inserts
+            db.execute(insert(BotTelemetry.__table__), rows, bind_arguments={"shard_id": PRIMARY_SHARD})
+            db.commit()
+            self.frames_written += len(rows)
+            self.flushes += 1
+        except Exception as e:
+            db.rollback()
+            self.frames_failed += len(rows)
+            print(f"❌ [TELEMETRY] Failed to write {len(rows)} frames: {type(e).__name__}: {e}")
+        finally:
+            db.close()
+
+
+# Process-wide buffer, started in the application lifespan
+telemetry_buffer = TelemetryBuffer()
@@ -0,0 +1,142 @@
+"""
+Telemetry Load Generator for Horizn Backend
+Simulates many delivery bots streaming frames to /ws/telemetry
+
+Usage:
+    python -m telemetry.loadgen --bot-token $BOT_TOKEN --bots 2000 --rate 1
+    python -m telemetry.loadgen --email ops@horizn.dev --password secret --bots 2000 --rate 1
+
+Bots authenticate like real ones with ``--bot-token`` (sent as the
+X-Bot-Token header; must be one of the server's BOT_TOKENS), or as an
+ops user with ``--token`` or ``--email/--password``; that account must
+be listed in ADMIN_EMAILS, since /ws/telemetry refuses other users.
+
+Each simulated bot opens its own WebSocket and random-walks around a
+center point. Thousands of bots need a raised open-file limit
+(``ulimit -n``) on both the server and the load generator.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import httpx
+import websockets
+
+STATUSES = ["idle", "en_route", "delivering", "returning"]
+
+
+class LoadStats:
+    """Counters shared by all simulated bots"""
+
+    def __init__(self):
+        self.connected = 0
+        self.sent = 0
+        self.errors = 0
+
+
+def login(base_url: str, email: str, password: str) -> str:
+    """Log in through the REST API and return an access token"""
+    response = httpx.post(f"{base_url}/auth/login", json={"email": email, "password": password}, timeout=30)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+async def run_bot(index: int, args, token: Optional[str], stats: LoadStats, stop_at: float) -> None:
+    """Connect one bot and send frames at the configured rate until stop_at"""
+    ws_url = args.base_url.replace("http", "ws", 1)
+    url = f"{ws_url}/ws/telemetry?bot_id=sim-{index:06d}"
+    headers = {}
+    if args.bot_token:
+        headers["X-Bot-Token"] = args.bot_token
+    else:
+        url += f"&token={token}"
+    latitude = args.latitude + random.uniform(-0.05, 0.05)
+    longitude = args.longitude + random.uniform(-0.05, 0.05)
+    battery = random.uniform(40, 100)
+    interval = 1.0 / args.rate
+
+    # Spread connection attempts over the ramp-up period
+    await asyncio.sleep(random.uniform(0, args.ramp))
+
+    try:
+        async with websockets.connect(url, additional_headers=headers, open_timeout=30) as websocket:
+            stats.connected += 1
+            try:
+                # Random phase so bots don't all send in the same tick
+                await asyncio.sleep(random.uniform(0, interval))
+                while time.monotonic() < stop_at:
+                    heading = random.uniform(0, 2 * math.pi)
+                    latitude += 0.0001 * math.cos(heading)
+                    longitude += 0.0001 * math.sin(heading)
+                    battery = max(0.0, battery - random.uniform(0, 0.01))
+                    await websocket.send(json.dumps({
+                        "latitude": round(latitude, 6),
+                        "longitude": round(longitude, 6),
+                        "battery": round(battery, 2),
+                        "status": random.choice(STATUSES),
+                        "recorded_at": datetime.now(timezone.utc).isoformat(),
+                    }))
+                    stats.sent += 1
+                    await asyncio.sleep(interval)
+            finally:
+                stats.connected -= 1
+    except (OSError, websockets.WebSocketException) as e:
+        stats.errors += 1
+        if stats.errors <= 5:
+            print(f"❌ Bot {index}: {type(e).__name__}: {e}")
+
+
+async def report(stats: LoadStats, stop_at: float) -> None:
+    """Print throughput once per second"""
+    last_sent = 0
+    while time.monotonic() < stop_at:
+        await asyncio.sleep(1)
+        print(f"connected={stats.connected} frames/s={stats.sent - last_sent} total={stats.sent} errors={stats.errors}")
+        last_sent = stats.sent
+
+
+async def main_async(args) -> None:
+    token = None
+    if not args.bot_token:
+        token = args.token or login(args.base_url, args.email, args.password)
+    stats = LoadStats()
+    started = time.monotonic()
+    stop_at = started + args.ramp + args.duration
+
+    bots = [run_bot(i, args, token, stats, stop_at) for i in range(args.bots)]
+    await asyncio.gather(report(stats, stop_at), *bots)
+
+    elapsed = time.monotonic() - started
+    print(f"\n✅ Sent {stats.sent} frames from {args.bots} bots in {elapsed:.1f}s "
+          f"({stats.sent / elapsed:.0f} frames/s, {stats.errors} connection errors)")
+
+
+def main():
+    """CLI entry point"""
+    parser = argparse.ArgumentParser(description="Simulate delivery bots streaming telemetry")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--bot-token", help="Bot token sent as X-Bot-Token (one of the server's BOT_TOKENS)")
+    parser.add_argument("--token", help="Admin access token (otherwise log in with --email/--password)")
+    parser.add_argument("--email", help="Admin account to log in as (must be in ADMIN_EMAILS)")
+    parser.add_argument("--password", help="Password for --email")
+    parser.add_argument("--bots", type=int, default=1000, help="Number of simulated bots")
+    parser.add_argument("--rate", type=float, default=1.0, help="Frames per second per bot")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to stream after ramp-up")
+    parser.add_argument("--ramp", type=float, default=5.0, help="Seconds over which bots connect")
+    parser.add_argument("--latitude", type=float, default=6.5244, help="Center latitude")
+    parser.add_argument("--longitude", type=float, default=3.3792, help="Center longitude")
+    args = parser.parse_args()
+
+    if not args.bot_token and not args.token and not (args.email and args.password):
+        parser.error("Provide --bot-token, --token, or --email and --password")
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
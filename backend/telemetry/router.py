@@ -0,0 +1,160 @@
+"""
+Telemetry Router for Horizn Backend
+WebSocket ingestion of delivery-bot position, battery and status frames
+"""
+import time
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from database import SessionLocal
+from auth.utils import decode_token
+from auth.permissions import BOT_TOKENS, UserPermissions, get_user_permissions, require_admin, token_matches
+from telemetry.buffer import telemetry_buffer
+from telemetry.schemas import TelemetryFrame, TelemetryStats
+from tracking.hub import tracking_hub
+from dispatch.index import bot_index
+
+router = APIRouter(tags=["Telemetry"])
+
+# Connection count per bot currently streaming to this worker
+connected_bots: dict = {}
+
+
+# ============ Helper Functions ============
+
+def authenticate_websocket(websocket: WebSocket, token: Optional[str]) -> Optional[UserPermissions]:
+    """
+    Resolve the caller of a WebSocket from a JWT passed as ``?token=``
+    or an ``Authorization: Bearer`` header.
+
+    Returns:
+        UserPermissions or None if the token is missing, invalid or inactive
+    """
+    if not token:
+        authorization = websocket.headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[len("bearer "):]
+    if not token:
+        return None
+
+    payload = decode_token(token)
+    if payload is None:
+        return None
+
+    try:
+        user_id = int(payload.get("sub"))
+    except (ValueError, TypeError):
+        return None
+
+    db = SessionLocal()
+    try:
+        permissions = get_user_permissions(db, user_id)
+    finally:
+        db.close()
+
+    if permissions is None or not permissions.is_active:
+        return None
+    return permissions
+
+
+# ============ Endpoints ============
+
+@router.websocket("/ws/telemetry")
+async def telemetry_stream(
+    websocket: WebSocket,
+    bot_id: str = Query(..., min_length=1, max_length=64),
+    token: Optional[str] = Query(None)
+):
+    """
+    Stream telemetry frames from a bot.
+    Each text message is one JSON TelemetryFrame. Frames are buffered and
+    bulk-inserted; when the buffer is full the server stops reading until
+    it drains. Every frame updates the dispatch spatial index, and frames
+    with a delivery_id are also published to live tracking subscribers.
+    Invalid frames get an error message back and are dropped.
+
+    Only bots (an ``X-Bot-Token`` header matching one of BOT_TOKENS) and
+    admins (ops tooling, simulators) may stream; other users are refused.
+    """
+    reported_by: Optional[int] = None
+    if not token_matches(websocket.headers.get("x-bot-token"), BOT_TOKENS):
+        permissions = authenticate_websocket(websocket, token)
+        if permissions is None:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+            return
+        if not permissions.is_admin:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Bot or admin credentials required")
+            return
+        reported_by = permissions.user_id
+
+    await websocket.accept()
+    connected_bots[bot_id] = connected_bots.get(bot_id, 0) + 1
+
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                frame = TelemetryFrame.model_validate_json(message)
+            except ValidationError as e:
+                await websocket.send_json({"error": "invalid_frame", "detail": e.errors(include_url=False)})
+                continue
+
+            recorded_at = frame.recorded_at or datetime.utcnow()
+            await telemetry_buffer.put({
+                "bot_id": bot_id,
+                "reported_by": reported_by,
+                "latitude": frame.latitude,
+                "longitude": frame.longitude,
+                "battery": frame.battery,
+                "status": frame.status.value,
+                "delivery_id": frame.delivery_id,
+                "recorded_at": recorded_at,
+            })
+
+            # Freshness uses the server clock so a skewed bot clock can't hide or pin it
+            bot_index.update(
+                bot_id,
+                frame.latitude,
+                frame.longitude,
+                frame.status.value,
+                frame.battery,
+                time.time()
+            )
+
+            if frame.delivery_id:
+                await tracking_hub.publish(frame.delivery_id, {
+                    "type": "position",
+                    "delivery_id": frame.delivery_id,
+                    "bot_id": bot_id,
+                    "latitude": frame.latitude,
+                    "longitude": frame.longitude,
+                    "battery": frame.battery,
+                    "status": frame.status.value,
+                    "recorded_at": recorded_at.isoformat(),
+                })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        connected_bots[bot_id] -= 1
+        if connected_bots[bot_id] <= 0:
+            del connected_bots[bot_id]
+
+
+@router.get("/telemetry/stats", response_model=TelemetryStats)
+async def telemetry_stats(admin: UserPermissions = Depends(require_admin)):
+    """
+    [ADMIN] Telemetry buffer and connection counters for this worker.
+    """
+    return TelemetryStats(
+        buffered=len(telemetry_buffer),
+        capacity=telemetry_buffer.capacity,
+        frames_received=telemetry_buffer.frames_received,
+        frames_written=telemetry_buffer.frames_written,
+        frames_failed=telemetry_buffer.frames_failed,
+        flushes=telemetry_buffer.flushes,
+        backpressure_waits=telemetry_buffer.backpressure_waits,
+        connected_bots=len(connected_bots)
+    )
@@ -0,0 +1,31 @@
+"""
+Pydantic Schemas for Bot Telemetry
+Frames streamed over /ws/telemetry
+"""
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field
+
+from models import BotStatus
+
+
+class TelemetryFrame(BaseModel):
+    """Schema for a single telemetry frame sent by a bot"""
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
+    battery: float = Field(..., ge=0, le=100, description="Battery level in percent")
+    status: BotStatus
+    delivery_id: Optional[str] = Field(None, max_length=64)
+    recorded_at: Optional[datetime] = Field(None, description="Bot timestamp; defaults to receive time")
+
+
+class TelemetryStats(BaseModel):
+    """Counters for the telemetry write buffer"""
+    buffered: int
+    capacity: int
+    frames_received: int
+    frames_written: int
+    frames_failed: int
+    flushes: int
+    backpressure_waits: int
+    connected_bots: int
@@ -0,0 +1,63 @@
+"""
+Tracking Broker for Horizn Backend
+Relays tracking updates between API workers (multi-worker deployments)
+
+Usage:
+    python -m tracking.broker --host 127.0.0.1 --port 8790
+
+Then start each worker with TRACKING_BROKER_URL=tcp://127.0.0.1:8790.
+Every newline-delimited message a worker sends is forwarded to all
+connected workers, including the sender.
+"""
+import argparse
+import asyncio
+
+from tracking.hub import BROKER_MAX_WRITE_BUFFER
+
+
+async def serve(host: str, port: int) -> None:
+    """Run the relay until cancelled"""
+    clients = set()
+    dropped = 0
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        nonlocal dropped
+        peer = writer.get_extra_info("peername")
+        clients.add(writer)
+        print(f"🔌 Worker connected: {peer} ({len(clients)} connected)")
+        try:
+            async for line in reader:
+                for client in list(clients):
+                    # Skip a worker that is not keeping up rather than buffering without bound
+                    if client.transport.get_write_buffer_size() > BROKER_MAX_WRITE_BUFFER:
+                        dropped += 1
+                        continue
+                    client.write(line)
+        except ConnectionError:
+            pass
+        finally:
+            clients.discard(writer)
+            writer.close()
+            print(f"🔌 Worker disconnected: {peer} ({len(clients)} connected, {dropped} updates dropped so far)")
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"📡 Tracking broker listening on {host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    """CLI entry point"""
+    parser = argparse.ArgumentParser(description="Relay live tracking updates between API workers")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind")
+    parser.add_argument("--port", type=int, default=8790, help="Port to bind")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("👋 Shutting down...")
+
+
+if __name__ == "__main__":
+    main()
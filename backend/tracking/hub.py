@@ -0,0 +1,228 @@
+"""
+Live Tracking Hub for Horizn Backend
+Per-delivery pub/sub that fans out the latest bot state to subscribers
+"""
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Callable, Dict, Optional, Set
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from cache import TTLCache
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+TRACKING_MAX_RATE_HZ = float(os.getenv("TRACKING_MAX_RATE_HZ", "2.0"))
+TRACKING_BROKER_URL = os.getenv("TRACKING_BROKER_URL")  # e.g. tcp://127.0.0.1:8790
+TRACKING_LATEST_TTL_SECONDS = int(os.getenv("TRACKING_LATEST_TTL_SECONDS", "600"))
+
+# Bytes a broker connection may buffer before updates are dropped
+BROKER_MAX_WRITE_BUFFER = 1024 * 1024
+
+Deliver = Callable[[str, dict], None]
+
+
+class Subscription:
+    """
+    One subscriber's mailbox for a delivery.
+
+    Holds only the most recent state: a newer update replaces one the
+    subscriber has not sent yet, so slow consumers skip stale frames
+    instead of building a backlog.
+    """
+
+    def __init__(self, delivery_id: str, max_rate: float):
+        self.delivery_id = delivery_id
+        self.min_interval = 1.0 / max_rate
+        self.dropped = 0
+        self._latest: Optional[dict] = None
+        self._event = asyncio.Event()
+
+    def offer(self, state: dict) -> None:
+        """Replace the pending state with a newer one"""
+        if self._latest is not None:
+            self.dropped += 1
+        self._latest = state
+        self._event.set()
+
+    async def next(self) -> dict:
+        """Wait for and take the pending state"""
+        await self._event.wait()
+        self._event.clear()
+        state, self._latest = self._latest, None
+        return state
+
+
+class InProcessBroker:
+    """Delivers published updates to subscribers in this process only"""
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+
+    async def publish(self, delivery_id: str, state: dict) -> None:
+        self._deliver(delivery_id, state)
+
+    async def stop(self) -> None:
+        pass
+
+
+class SocketBroker:
+    """
+    Relays updates through a ``tracking.broker`` process so every worker
+    sees updates published by any other worker. Reconnects with backoff;
+    updates published while disconnected (or while the broker is not
+    keeping up) are delivered to this worker's subscribers only and
+    counted in ``dropped``.
+    """
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 8790
+        self.dropped = 0
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver) -> None:
+        self._deliver = deliver
+        self._task = asyncio.create_task(self._run())
+
+    async def publish(self, delivery_id: str, state: dict) -> None:
+        writer = self._writer
+        if writer is None or writer.transport.get_write_buffer_size() > BROKER_MAX_WRITE_BUFFER:
+            # Not relayed to other workers, but local subscribers still get it
+            self.dropped += 1
+            self._deliver(delivery_id, state)
+            return
+        writer.write(json.dumps({"delivery_id": delivery_id, "state": state}).encode() + b"\n")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        """Keep a connection to the broker open and dispatch incoming updates"""
+        backoff = 0.5
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                self._writer = writer
+                backoff = 0.5
+                print(f"📡 [TRACKING] Connected to broker at {self.host}:{self.port}")
+                try:
+                    async for line in reader:
+                        message = json.loads(line)
+                        self._deliver(message["delivery_id"], message["state"])
+                finally:
+                    self._writer = None
+                    writer.close()
+            except (OSError, ValueError) as e:
+                print(f"❌ [TRACKING] Broker connection error: {type(e).__name__}: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 10.0)
+
+
+class TrackingHub:
+    """
+    Fans out bot state to WebSocket/SSE subscribers keyed by delivery ID.
+
+    Publishing goes through the broker so that, with a socket broker,
+    subscribers on every worker receive it. The last state per delivery
+    is kept so a new subscriber gets a position immediately.
+    """
+
+    def __init__(self, broker=None, max_rate: float = TRACKING_MAX_RATE_HZ):
+        self.broker = broker or InProcessBroker()
+        self.max_rate = max_rate
+        self.published = 0
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._latest = TTLCache(maxsize=100000, ttl=TRACKING_LATEST_TTL_SECONDS)
+
+    async def start(self) -> None:
+        await self.broker.start(self._deliver)
+
+    async def stop(self) -> None:
+        await self.broker.stop()
+
+    async def publish(self, delivery_id: str, state: dict) -> None:
+        """Publish a new state for a delivery"""
+        self.published += 1
+        await self.broker.publish(delivery_id, state)
+
+    def subscribe(self, delivery_id: str, max_rate: Optional[float] = None) -> Subscription:
+        """
+        Register a subscriber, capped at the hub's max rate.
+        The last known state (if any) is queued straight away.
+        """
+        rate = min(max_rate or self.max_rate, self.max_rate)
+        subscription = Subscription(delivery_id, rate)
+        self._subscriptions.setdefault(delivery_id, set()).add(subscription)
+
+        latest = self._latest.get(delivery_id)
+        if latest is not None:
+            subscription.offer(latest)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscriptions.get(subscription.delivery_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscriptions[subscription.delivery_id]
+
+    def stats(self) -> dict:
+        subscribers = sum(len(subs) for subs in self._subscriptions.values())
+        return {
+            "deliveries": len(self._subscriptions),
+            "subscribers": subscribers,
+            "published": self.published,
+            "broker": type(self.broker).__name__,
+            "broker_dropped": getattr(self.broker, "dropped", 0),
+        }
+
+    def _deliver(self, delivery_id: str, state: dict) -> None:
+        """Hand an update to every local subscriber of the delivery"""
+        self._latest.set(delivery_id, state)
+        for subscription in self._subscriptions.get(delivery_id, ()):
+            subscription.offer(state)
+
+
+async def iter_updates(
+    subscription: Subscription,
+    keepalive_seconds: float = 15.0
+) -> AsyncIterator[Optional[dict]]:
+    """
+    Yield coalesced updates at no more than the subscription's rate.
+    Yields ``None`` as a keepalive when nothing happened for a while so
+    the caller writes something and notices disconnected clients.
+    """
+    while True:
+        try:
+            state = await asyncio.wait_for(subscription.next(), keepalive_seconds)
+        except asyncio.TimeoutError:
+            yield None
+            continue
+        yield state
+        # Updates arriving during this pause coalesce into the next one
+        await asyncio.sleep(subscription.min_interval)
+
+
+def create_broker():
+    """Pick the broker backend from TRACKING_BROKER_URL"""
+    if TRACKING_BROKER_URL:
+        return SocketBroker(TRACKING_BROKER_URL)
+    return InProcessBroker()
+
+
+# Process-wide hub, started in the application lifespan
+tracking_hub = TrackingHub(create_broker())
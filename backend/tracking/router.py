@@ -0,0 +1,102 @@
+"""
+Tracking Router for Horizn Backend
+Live bot positions for a delivery over WebSocket or Server-Sent Events
+"""
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, get_db
+from models import User
+from auth.utils import get_current_user, get_current_active_user
+from auth.permissions import UserPermissions, require_admin
+from tracking.hub import tracking_hub, iter_updates
+
+router = APIRouter(tags=["Tracking"])
+
+
+# ============ Endpoints ============
+
+@router.websocket("/ws/tracking/{delivery_id}")
+async def track_delivery_ws(
+    websocket: WebSocket,
+    delivery_id: str,
+    token: Optional[str] = Query(None),
+    max_rate: Optional[float] = Query(None, gt=0)
+):
+    """
+    Live bot state for a delivery over WebSocket.
+    Authenticate with ``?token=`` or an Authorization header. Updates are
+    coalesced to at most ``max_rate`` per second (capped by the server);
+    ``{"type": "ping"}`` is sent when the bot is quiet.
+    """
+    if not token:
+        authorization = websocket.headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            token = authorization[len("bearer "):]
+
+    db = SessionLocal()
+    try:
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token) if token else None
+        user = await get_current_user(websocket, credentials, db)
+        await get_current_active_user(user)
+    except HTTPException as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=e.detail)
+        return
+    finally:
+        db.close()
+
+    await websocket.accept()
+    subscription = tracking_hub.subscribe(delivery_id, max_rate)
+    try:
+        async for state in iter_updates(subscription):
+            await websocket.send_json(state if state is not None else {"type": "ping"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tracking_hub.unsubscribe(subscription)
+
+
+@router.get("/tracking/{delivery_id}/stream")
+async def track_delivery_sse(
+    delivery_id: str,
+    max_rate: Optional[float] = Query(None, gt=0),
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Live bot state for a delivery as Server-Sent Events.
+    Same coalescing as the WebSocket; comment lines keep the stream alive.
+    """
+    # Release the pooled connection now rather than holding it for the whole stream
+    db.close()
+
+    subscription = tracking_hub.subscribe(delivery_id, max_rate)
+
+    async def event_stream():
+        try:
+            async for state in iter_updates(subscription):
+                if state is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: position\ndata: {json.dumps(state)}\n\n"
+        finally:
+            tracking_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/tracking/stats")
+async def tracking_stats(admin: UserPermissions = Depends(require_admin)):
+    """
+    [ADMIN] Subscriber and broker counters for this worker.
+    """
+    return tracking_hub.stats()
@@ -0,0 +1 @@
+# Users module
@@ -0,0 +1,244 @@
+"""
+Bulk User Export for Horizn Backend
+Streams the users table as CSV, NDJSON or Parquet in fixed-size chunks
+
+Usage:
+    python -m users.export --format csv --out users.csv
+    python -m users.export --format parquet --out users.parquet --created-from 2026-01-01
+
+Rows are read with a server-side cursor (``stream_results``) in batches
+of ``chunk_size`` and each batch is encoded and handed on before the next
+is fetched, so memory stays flat however large the table is. Parquet
+output needs the optional ``pyarrow`` package and writes one row group
+per batch.
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import User
+
+DEFAULT_CHUNK_SIZE = 5000
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Exported columns; credentials and provider identifiers are left out
+EXPORT_COLUMNS = [
+    User.id,
+    User.email,
+    User.first_name,
+    User.last_name,
+    User.country,
+    User.is_verified,
+    User.is_active,
+    User.is_sender,
+    User.sender_request_status,
+    User.sender_requested_at,
+    User.auth_provider,
+    User.created_at,
+    User.updated_at,
+    User.last_login_at,
+    User.last_seen_at,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+class ExportUnavailable(Exception):
+    """Requested format needs an optional dependency that isn't installed"""
+
+
+def iter_user_batches(
+    db: Session,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[List[tuple]]:
+    """
+    Yield users as lists of row tuples (EXPORT_FIELDS order), ordered by
+    id (within each shard when users are sharded).
+    ``created_from`` is inclusive and ``created_to`` exclusive, so
+    consecutive incremental exports neither overlap nor miss rows.
+    """
+    stmt = select(*EXPORT_COLUMNS).order_by(User.id)
+    if created_from is not None:
+        stmt = stmt.where(User.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(User.created_at < created_to)
+
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv_chunks(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for rows in batches:
+        writer.writerows([[_encode_value(value) for value in row] for row in rows])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_FIELDS, map(_encode_value, row)))) + "\n"
+            for row in rows
+        ).encode()
+
+
+class _DrainBuffer(io.RawIOBase):
+    """Write-only sink whose contents are taken out after every row group"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _parquet_chunks(batches: Iterator[List[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()),
+        ("email", pa.string()),
+        ("first_name", pa.string()),
+        ("last_name", pa.string()),
+        ("country", pa.string()),
+        ("is_verified", pa.bool_()),
+        ("is_active", pa.bool_()),
+        ("is_sender", pa.bool_()),
+        ("sender_request_status", pa.string()),
+        ("sender_requested_at", pa.timestamp("us", tz="UTC")),
+        ("auth_provider", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+        ("last_login_at", pa.timestamp("us", tz="UTC")),
+        ("last_seen_at", pa.timestamp("us", tz="UTC")),
+    ])
+    sink = _DrainBuffer()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            ))
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def check_format(fmt: str) -> None:
+    """
+    Raises:
+        ValueError: Unknown format
+        ExportUnavailable: Parquet requested without pyarrow installed
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportUnavailable("Parquet export requires the pyarrow package")
+
+
+def stream_users(
+    fmt: str,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """
+    Encoded export as a byte stream, using its own session so it can
+    outlive the request that started it (StreamingResponse iterates it
+    in the threadpool after the endpoint has returned).
+    """
+    check_format(fmt)
+    encoders = {"csv": _csv_chunks, "ndjson": _ndjson_chunks, "parquet": _parquet_chunks}
+
+    db = SessionLocal()
+    try:
+        batches = iter_user_batches(db, created_from, created_to, chunk_size)
+        yield from encoders[fmt](batches)
+    finally:
+        db.close()
+
+
+def main():
+    """Export users to a file or stdout"""
+    parser = argparse.ArgumentParser(description="Stream the users table to CSV, NDJSON or Parquet")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--out", help="Output path (default: stdout; required for parquet)")
+    parser.add_argument("--created-from", type=datetime.fromisoformat, help="Only users created at or after this time")
+    parser.add_argument("--created-to", type=datetime.fromisoformat, help="Only users created before this time")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    if args.format == "parquet" and not args.out:
+        parser.error("--out is required for parquet")
+    try:
+        check_format(args.format)
+    except ExportUnavailable as e:
+        parser.error(str(e))
+
+    out = open(args.out, "wb") if args.out else sys.stdout.buffer
+    started = time.perf_counter()
+    written = 0
+    try:
+        for chunk in stream_users(args.format, args.created_from, args.created_to, args.chunk_size):
+            out.write(chunk)
+            written += len(chunk)
+    finally:
+        if args.out:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"📤 Exported {written / 1e6:.1f} MB of users as {args.format} in {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
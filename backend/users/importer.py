@@ -0,0 +1,328 @@
+"""
+Bulk User Import for Horizn Backend
+Loads users from a CSV or NDJSON file in batches
+
+Usage:
+    python -m users.importer legacy_users.csv --batch-size 1000 --workers 8
+    python -m users.importer legacy_users.ndjson --verified --failures failed.csv
+
+Each row needs email, first_name, last_name and either a plaintext
+``password`` or an existing bcrypt ``password_hash``; phone, country and
+is_verified are optional. Per batch, rows are validated, deduplicated
+within the batch and against existing users with a single
+``email_normalized IN (...)`` query, plaintext passwords are bcrypt-hashed
+across a process pool, and the survivors are inserted with one
+executemany. Rows that fail are reported with their line number instead
+of aborting the import.
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from sharding import PRIMARY_SHARD
+
+from database import SessionLocal, group_by_user_shard, shard_router
+from models import User, normalize_email
+from auth.utils import hash_password
+from auth.email_filter import email_filter
+from users.schemas import ImportFailure, ImportResult, ImportUserRow
+
+# Configuration
+IMPORT_HASH_WORKERS = int(os.getenv("IMPORT_HASH_WORKERS", str(os.cpu_count() or 2)))
+# Hashing processes for imports run by the API server, kept well below the
+# core count so logins and registrations keep their CPU
+IMPORT_SERVER_HASH_WORKERS = int(os.getenv("IMPORT_SERVER_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 4))))
+DEFAULT_BATCH_SIZE = 1000
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# (line number, CSV record or raw NDJSON line)
+SourceRow = Tuple[int, Union[Dict[str, str], str]]
+
+
+# ============ Reading ============
+
+def detect_format(filename: str) -> str:
+    """Import format from a file extension"""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".ndjson", ".jsonl", ".json"):
+        return "ndjson"
+    raise ValueError(f"Cannot tell the format of '{filename}', expected .csv or .ndjson")
+
+
+def read_rows(source: TextIO, fmt: str) -> Iterator[SourceRow]:
+    """Yield rows lazily so the whole file is never held in memory"""
+    if fmt == "csv":
+        reader = csv.DictReader(source)
+        for record in reader:
+            # Empty cells mean "not provided", not empty strings
+            yield reader.line_num, {key: value for key, value in record.items() if key and value != ""}
+    else:
+        for line_number, line in enumerate(source, start=1):
+            if line.strip():
+                yield line_number, line
+
+
+def parse_row(raw: Union[Dict[str, str], str]) -> ImportUserRow:
+    if isinstance(raw, str):
+        return ImportUserRow.model_validate_json(raw)
+    return ImportUserRow.model_validate(raw)
+
+
+def _describe(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+# ============ Hashing Pool ============
+
+_server_pool: Optional[ProcessPoolExecutor] = None
+_server_pool_lock = threading.Lock()
+
+
+def server_hash_pool() -> Optional[Executor]:
+    """
+    Process pool shared by every import the API server runs, created on
+    first use with IMPORT_SERVER_HASH_WORKERS processes (None for 1, which
+    hashes in the calling thread). Workers are spawned rather than forked,
+    since forking a process with running threads and open connections is
+    unsafe.
+    """
+    global _server_pool
+    if IMPORT_SERVER_HASH_WORKERS <= 1:
+        return None
+    with _server_pool_lock:
+        if _server_pool is None:
+            _server_pool = ProcessPoolExecutor(
+                max_workers=IMPORT_SERVER_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _server_pool
+
+
+def shutdown_server_hash_pool() -> None:
+    """Stop the shared pool's processes (application shutdown)"""
+    global _server_pool
+    with _server_pool_lock:
+        if _server_pool is not None:
+            _server_pool.shutdown(cancel_futures=True)
+            _server_pool = None
+
+
+# ============ Importing ============
+
+def _insert_values(row: ImportUserRow, password_hash: str, mark_verified: bool) -> dict:
+    # Core insert bypasses the ORM, so set what the model would have
+    return {
+        "email": row.email,
+        "email_normalized": normalize_email(row.email),
+        "password_hash": password_hash,
+        "first_name": row.first_name,
+        "last_name": row.last_name,
+        "phone": row.phone,
+        "country": row.country,
+        "is_verified": row.is_verified or mark_verified,
+        "is_active": True,
+        "is_sender": False,
+        "auth_provider": "email",
+        "row_version": 1,
+    }
+
+
+def _insert_users(db: Session, values: List[dict]) -> List[Tuple[int, str]]:
+    """
+    executemany INSERT returning (id, email_normalized). With sharded
+    users, ids come from the directory first and each shard gets its rows.
+    """
+    if shard_router is not None:
+        conn = db.connection(bind_arguments={"shard_id": PRIMARY_SHARD})
+        ids = shard_router.allocate_user_ids(conn, [row["email_normalized"] for row in values])
+        values = [{**row, "id": ids[row["email_normalized"]]} for row in values]
+
+    users_table = User.__table__
+    stmt = insert(users_table).returning(users_table.c.id, users_table.c.email_normalized)
+    inserted = []
+    for bind_arguments, shard_values in group_by_user_shard(values, user_id_key="id"):
+        inserted.extend(db.execute(stmt, shard_values, bind_arguments=bind_arguments).all())
+    return inserted
+
+
+def import_batch(
+    db: Session,
+    batch: List[SourceRow],
+    pool: Optional[Executor],
+    failures: List[ImportFailure],
+    mark_verified: bool = False
+) -> int:
+    """
+    Import one batch, appending rejected rows to ``failures``.
+
+    Returns:
+        Number of users inserted
+    """
+    # Validate and drop duplicates within the batch (first occurrence wins)
+    candidates: Dict[str, Tuple[int, ImportUserRow]] = {}
+    for line, raw in batch:
+        try:
+            row = parse_row(raw)
+        except ValidationError as e:
+            email = raw.get("email") if isinstance(raw, dict) else None
+            failures.append(ImportFailure(line=line, email=email, reason=_describe(e)))
+            continue
+        key = normalize_email(row.email)
+        if key in candidates:
+            failures.append(ImportFailure(line=line, email=row.email, reason=f"Duplicate of line {candidates[key][0]}"))
+            continue
+        candidates[key] = (line, row)
+
+    if not candidates:
+        return 0
+
+    # One set-based lookup for the whole batch
+    existing = set(db.execute(
+        select(User.email_normalized).where(User.email_normalized.in_(list(candidates)))
+    ).scalars())
+    for key in existing:
+        line, row = candidates.pop(key)
+        failures.append(ImportFailure(line=line, email=row.email, reason="Email already registered"))
+
+    if not candidates:
+        return 0
+
+    # bcrypt only the plaintext passwords, spread over the pool
+    pending = list(candidates.values())
+    plaintext = [row.password for _, row in pending if row.password_hash is None]
+    if pool is not None and len(plaintext) > 1:
+        hashes = iter(pool.map(hash_password, plaintext, chunksize=max(1, len(plaintext) // 64)))
+    else:
+        hashes = iter(map(hash_password, plaintext))
+    values = [
+        _insert_values(row, row.password_hash or next(hashes), mark_verified)
+        for _, row in pending
+    ]
+
+    try:
+        inserted = _insert_users(db, values)
+        db.commit()
+    except IntegrityError:
+        # A concurrent registration took one of the emails; retry row by row to find it
+        db.rollback()
+        inserted = []
+        for (line, row), row_values in zip(pending, values):
+            try:
+                with db.begin_nested():
+                    inserted.extend(_insert_users(db, [row_values]))
+            except IntegrityError:
+                failures.append(ImportFailure(line=line, email=row.email, reason="Email already registered"))
+        db.commit()
+
+    # Core inserts skip the ORM after_insert hook that keeps the filter current
+    for user_id, email_normalized in inserted:
+        email_filter.add(email_normalized, user_id)
+    return len(inserted)
+
+
+def import_users(
+    rows: Iterator[SourceRow],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = IMPORT_HASH_WORKERS,
+    mark_verified: bool = False,
+    progress: bool = False,
+    pool: Optional[Executor] = None
+) -> ImportResult:
+    """
+    Import every row, batch by batch, in one session.
+    Hashes on ``pool`` when given (left running for the caller), otherwise
+    on a pool of ``workers`` processes that lives for this import.
+    """
+    failures: List[ImportFailure] = []
+    total = imported = 0
+    started = time.perf_counter()
+
+    own_pool = pool is None and workers > 1
+    if own_pool:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    db = SessionLocal()
+    try:
+        batch: List[SourceRow] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                total += len(batch)
+                imported += import_batch(db, batch, pool, failures, mark_verified)
+                batch = []
+                if progress:
+                    elapsed = time.perf_counter() - started
+                    print(f"📥 {total} rows read, {imported} imported ({imported / elapsed:.0f} rows/s)", file=sys.stderr)
+        if batch:
+            total += len(batch)
+            imported += import_batch(db, batch, pool, failures, mark_verified)
+    finally:
+        db.close()
+        if own_pool:
+            pool.shutdown()
+
+    seconds = time.perf_counter() - started
+    failures.sort(key=lambda failure: failure.line)
+    return ImportResult(
+        total=total,
+        imported=imported,
+        failed=len(failures),
+        seconds=round(seconds, 3),
+        rows_per_second=round(imported / seconds, 1) if seconds else 0.0,
+        failures=failures
+    )
+
+
+def main():
+    """Import users from a file"""
+    parser = argparse.ArgumentParser(description="Bulk import users from CSV or NDJSON")
+    parser.add_argument("path", help="Input file (.csv or .ndjson)")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="Override format detection")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=IMPORT_HASH_WORKERS, help="bcrypt processes (1 = in-process)")
+    parser.add_argument("--verified", action="store_true", help="Mark every imported user as verified")
+    parser.add_argument("--failures", help="Write failed rows to this CSV")
+    args = parser.parse_args()
+
+    try:
+        fmt = args.format or detect_format(args.path)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with open(args.path, newline="", encoding="utf-8") as source:
+        result = import_users(read_rows(source, fmt), args.batch_size, args.workers, args.verified, progress=True)
+
+    if args.failures:
+        with open(args.failures, "w", newline="") as out:
+            writer = csv.writer(out)
+            writer.writerow(["line", "email", "reason"])
+            writer.writerows([failure.line, failure.email, failure.reason] for failure in result.failures)
+    else:
+        for failure in result.failures[:20]:
+            print(f"⚠️  Line {failure.line} ({failure.email}): {failure.reason}", file=sys.stderr)
+        if result.failed > 20:
+            print(f"... and {result.failed - 20} more (use --failures to save them)", file=sys.stderr)
+
+    print(
+        f"✅ Imported {result.imported}/{result.total} users, {result.failed} failed, "
+        f"in {result.seconds:.1f}s ({result.rows_per_second:.0f} rows/s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Batch User Lookup for Horizn Backend
+Resolves many user ids with one query, behind a per-user cache
+"""
+import asyncio
+import os
+from typing import Dict, Iterable, List
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+from cache import TTLCache
+from database import SessionLocal
+from models import User
+from auth.schemas import UserResponse
+
+# Load environment variables
+load_dotenv()
+
+# Configuration
+USER_CACHE_TTL_SECONDS = int(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", "100000"))
+
+
+class UserLookup:
+    """
+    Cache of ``UserResponse`` records keyed by user id.
+
+    Misses are loaded with a single ``WHERE id IN (...)`` query in a
+    worker thread. Ids that another request is already loading are not
+    queried again; the second request awaits the first one's result.
+    Entries are invalidated when the ORM updates a user (and explicitly
+    after bulk Core updates); other workers see the change within
+    USER_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_MAXSIZE, ttl: int = USER_CACHE_TTL_SECONDS):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._inflight: Dict[int, asyncio.Future] = {}
+        # Bumped on invalidation so a load that raced with it isn't cached
+        self._generation = 0
+        self.queries = 0
+        self.rows_loaded = 0
+        self.inflight_joined = 0
+
+    async def get_many(self, user_ids: Iterable[int]) -> Dict[int, UserResponse]:
+        """
+        Resolve ids to users; unknown ids are absent from the result.
+
+        Raises:
+            SQLAlchemyError: If the load query fails
+        """
+        found: Dict[int, UserResponse] = {}
+        pending: Dict[int, asyncio.Future] = {}
+        to_load: List[int] = []
+
+        for user_id in dict.fromkeys(user_ids):
+            user = self.cache.get(user_id)
+            if user is not None:
+                found[user_id] = user
+            elif user_id in self._inflight:
+                pending[user_id] = self._inflight[user_id]
+                self.inflight_joined += 1
+            else:
+                to_load.append(user_id)
+
+        if to_load:
+            found.update(await self._load(to_load))
+
+        for user_id, future in pending.items():
+            # Shielded so a cancelled waiter doesn't cancel the shared load
+            loaded = await asyncio.shield(future)
+            if user_id in loaded:
+                found[user_id] = loaded[user_id]
+        return found
+
+    async def _load(self, user_ids: List[int]) -> Dict[int, UserResponse]:
+        future = asyncio.get_running_loop().create_future()
+        for user_id in user_ids:
+            self._inflight[user_id] = future
+
+        generation = self._generation
+        try:
+            loaded = await asyncio.to_thread(self._query, user_ids)
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved here; waiters re-raise it
+            raise
+        else:
+            if generation == self._generation:
+                for user_id, user in loaded.items():
+                    self.cache.set(user_id, user)
+            future.set_result(loaded)
+            return loaded
+        finally:
+            for user_id in user_ids:
+                if self._inflight.get(user_id) is future:
+                    del self._inflight[user_id]
+
+    def _query(self, user_ids: List[int]) -> Dict[int, UserResponse]:
+        db = SessionLocal()
+        try:
+            users = db.query(User).filter(User.id.in_(user_ids)).all()
+            self.queries += 1
+            self.rows_loaded += len(users)
+            return {user.id: UserResponse.model_validate(user) for user in users}
+        finally:
+            db.close()
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        """Drop cached users after their rows change"""
+        self._generation += 1
+        self.cache.invalidate_many(user_ids)
+
+    def stats(self) -> dict:
+        return {
+            **self.cache.stats(),
+            "queries": self.queries,
+            "rows_loaded": self.rows_loaded,
+            "inflight_joined": self.inflight_joined,
+        }
+
+
+# Process-wide lookup cache
+user_lookup = UserLookup()
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target: User) -> None:
+    """Profile edits, verification, avatar and sender changes through the ORM"""
+    user_lookup.invalidate([target.id])
@@ -0,0 +1,131 @@
+"""
+Users Router for Horizn Backend
+Administrative bulk operations on user accounts
+"""
+import io
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from admission import import_admission
+from auth.permissions import UserPermissions, require_admin, require_internal_service
+from users.export import (
+    DEFAULT_CHUNK_SIZE,
+    MEDIA_TYPES,
+    ExportUnavailable,
+    check_format,
+    stream_users
+)
+from users.importer import (
+    DEFAULT_BATCH_SIZE,
+    IMPORT_SERVER_HASH_WORKERS,
+    detect_format,
+    import_users,
+    read_rows,
+    server_hash_pool
+)
+from users.lookup import user_lookup
+from users.schemas import ImportResult, UserBatchRequest, UserBatchResponse
+
+router = APIRouter(prefix="/users", tags=["Users"])
+internal_router = APIRouter(prefix="/internal/users", tags=["Internal"])
+
+# Export batch size limits
+MAX_CHUNK_SIZE = 50000
+
+# Import limits; the full failure list is only available from the CLI
+MAX_IMPORT_BATCH_SIZE = 10000
+MAX_REPORTED_FAILURES = 1000
+
+
+# ============ Endpoints ============
+
+@router.get("/export")
+async def export_users(
+    format: Literal["csv", "ndjson", "parquet"] = "csv",
+    created_from: Optional[datetime] = Query(None, description="Only users created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only users created before this time"),
+    chunk_size: int = Query(DEFAULT_CHUNK_SIZE, ge=100, le=MAX_CHUNK_SIZE),
+    admin: UserPermissions = Depends(require_admin)
+):
+    """
+    [ADMIN] Stream every user (optionally a created_at range) as CSV,
+    NDJSON or Parquet. Rows are fetched through a server-side cursor and
+    sent chunk by chunk, so the response starts immediately and memory
+    does not grow with the table.
+    """
+    try:
+        check_format(format)
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    print(f"\n📤 [DEV] User export ({format}) started by user {admin.user_id}\n")
+
+    return StreamingResponse(
+        stream_users(format, created_from, created_to, chunk_size),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users-{stamp}.{format}"'}
+    )
+
+
+@router.post("/import", response_model=ImportResult)
+async def import_users_file(
+    request: Request,
+    file: UploadFile = File(...),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_IMPORT_BATCH_SIZE),
+    mark_verified: bool = Query(False, description="Mark every imported user as verified"),
+    admin: UserPermissions = Depends(require_admin)
+):
+    """
+    [ADMIN] Bulk import users from a CSV or NDJSON upload.
+    Rows need email, first_name, last_name and either password or a
+    bcrypt password_hash. Invalid or already-registered rows are reported
+    by line number and skipped; the rest are inserted in batches.
+    Imports run one at a time (USER_IMPORT_MAX_CONCURRENCY) on a small
+    shared hashing pool; a busy server answers 503 with Retry-After.
+    """
+    try:
+        fmt = detect_format(file.filename or "")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async with import_admission.slot(request):
+        print(f"\n📥 [DEV] User import of {file.filename} started by user {admin.user_id}\n")
+        source = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+        try:
+            # Hashing runs on the shared pool; the batch loop blocks, so keep it off the event loop
+            result = await run_in_threadpool(
+                import_users, read_rows(source, fmt), batch_size, IMPORT_SERVER_HASH_WORKERS,
+                mark_verified, pool=server_hash_pool()
+            )
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Import file must be UTF-8")
+        finally:
+            source.detach()
+
+    print(f"\n✅ [DEV] Imported {result.imported}/{result.total} users ({result.rows_per_second:.0f} rows/s)\n")
+    result.failures = result.failures[:MAX_REPORTED_FAILURES]
+    return result
+
+
+@internal_router.post("/batch", response_model=UserBatchResponse)
+async def batch_lookup_users(
+    data: UserBatchRequest,
+    caller: Optional[UserPermissions] = Depends(require_internal_service)
+):
+    """
+    [INTERNAL] Resolve up to MAX_BATCH_LOOKUP user ids in one call.
+    Served from the per-user cache; misses are loaded with a single IN
+    query. Users come back in request order; unknown ids are listed in
+    ``missing``.
+    """
+    found = await user_lookup.get_many(data.ids)
+    ordered = list(dict.fromkeys(data.ids))
+    return UserBatchResponse(
+        users=[found[user_id] for user_id in ordered if user_id in found],
+        missing=[user_id for user_id in ordered if user_id not in found]
+    )
@@ -0,0 +1,64 @@
+"""
+Pydantic Schemas for User Administration
+Request/Response models for bulk user endpoints
+"""
+from typing import List, Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
+
+from auth.schemas import UserResponse
+
+# passlib/bcrypt modular crypt format: $2b$12$<53 chars of salt+hash>
+BCRYPT_HASH_PATTERN = r"^\$2[abxy]\$\d{2}\$[./A-Za-z0-9]{53}$"
+
+# Maximum number of ids in one batch lookup
+MAX_BATCH_LOOKUP = 500
+
+
+# ============ Request Schemas ============
+
+class ImportUserRow(BaseModel):
+    """One user in a bulk import file; exactly one of password / password_hash"""
+    email: EmailStr
+    first_name: str = Field(..., min_length=1, max_length=100)
+    last_name: str = Field(..., min_length=1, max_length=100)
+    password: Optional[str] = Field(None, min_length=6)
+    password_hash: Optional[str] = Field(None, pattern=BCRYPT_HASH_PATTERN)
+    phone: Optional[str] = Field(None, max_length=20)
+    country: Optional[str] = Field(None, max_length=100)
+    is_verified: bool = False
+
+    @model_validator(mode="after")
+    def _one_password(self):
+        if (self.password is None) == (self.password_hash is None):
+            raise ValueError("Provide exactly one of password or password_hash")
+        return self
+
+
+class UserBatchRequest(BaseModel):
+    """Schema for resolving many user ids at once"""
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BATCH_LOOKUP)
+
+
+# ============ Response Schemas ============
+
+class ImportFailure(BaseModel):
+    """A row that was not imported"""
+    line: int
+    email: Optional[str] = None
+    reason: str
+
+
+class ImportResult(BaseModel):
+    """Summary of a bulk import"""
+    total: int
+    imported: int
+    failed: int
+    seconds: float
+    rows_per_second: float
+    failures: List[ImportFailure]
+
+
+class UserBatchResponse(BaseModel):
+    """Users found for a batch lookup, in request order, plus unknown ids"""
+    users: List[UserResponse]
+    missing: List[int]
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import {
     StyleSheet,
     Text,
@@ -13,7 +13,7 @@ import {
 } from 'react-native';
 import { useNavigation } from '@react-navigation/native';
 import { StatusBar } from 'expo-status-bar';
-import { auth } from '../services/api';
+import { auth, newIdempotencyKey } from '../services/api';
 
 const { width } = Dimensions.get('window');
 
@@ -35,12 +35,23 @@ export default function SignUpScreen() {
     const [showPassword, setShowPassword] = useState(false);
     const [loading, setLoading] = useState(false);
 
+    // One Idempotency-Key per sign-up: tapping again after a failure retries
+    // the same registration, while editing the form starts a new one
+    const idempotencyKey = useRef(null);
+    useEffect(() => {
+        idempotencyKey.current = null;
+    }, [firstName, lastName, email, password]);
+
     // Simple validation to enable button
     const isFormValid = firstName && lastName && email && password;
 
     const handleSignUp = async () => {
         if (!isFormValid) return;
 
+        if (!idempotencyKey.current) {
+            idempotencyKey.current = newIdempotencyKey();
+        }
+
         setLoading(true);
         try {
             await auth.register({
@@ -48,7 +59,7 @@ export default function SignUpScreen() {
                 password,
                 first_name: firstName,
                 last_name: lastName
-            });
+            }, idempotencyKey.current);
             // Proceed to email verification
             navigation.navigate('EmailVerification', { email });
         } catch (error) {
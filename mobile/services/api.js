@@ -2,6 +2,7 @@ import axios from 'axios';
 import * as SecureStore from 'expo-secure-store';
 import { Platform } from 'react-native';
 import Constants from 'expo-constants';
+import * as Crypto from 'expo-crypto';
 
 // CONFIGURATION
 // API URL is set via EAS build environment variables
@@ -22,6 +23,16 @@ const api = axios.create({
 const TOKEN_KEY = 'auth_token';
 const USER_KEY = 'user_data';
 
+// ETag of the last profile fetched from /me (sent back as If-None-Match / If-Match)
+// and the body it belongs to; always set together so a 304 returns that exact body
+let profileEtag = null;
+let profileBody = null;
+
+const rememberProfile = (etag, body) => {
+    profileEtag = etag && body ? etag : null;
+    profileBody = profileEtag ? body : null;
+};
+
 // --- Token Management ---
 
 export const setAuthToken = async (token) => {
@@ -60,6 +71,7 @@ export const removeAuthToken = async () => {
             await SecureStore.deleteItemAsync(TOKEN_KEY);
             await SecureStore.deleteItemAsync(USER_KEY);
         }
+        rememberProfile(null, null);
     } catch (error) {
         console.error('Error removing token', error);
     }
@@ -97,6 +109,26 @@ export const getUserData = async () => {
 
 // --- Helper Functions ---
 
+// Random key sent as Idempotency-Key so a retried POST is replayed, not re-executed.
+// Create one per user action (e.g. per form submit) and reuse it for every retry of it.
+export const newIdempotencyKey = () => Crypto.randomUUID();
+
+// Resend a keyed request after a timeout or dropped connection; the key makes it safe
+const IDEMPOTENT_RETRIES = 2;
+
+const withRetries = async (request) => {
+    for (let attempt = 0; ; attempt++) {
+        try {
+            return await request();
+        } catch (error) {
+            // A response (even an error one) means the server handled it
+            if (error.response || attempt >= IDEMPOTENT_RETRIES) throw error;
+            console.log(`[API] Network error, retrying (${attempt + 1}/${IDEMPOTENT_RETRIES})`);
+            await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)));
+        }
+    }
+};
+
 export const convertAvatarUrl = (avatarUrl) => {
     if (!avatarUrl) return null;
     // If already a full URL, return as is
@@ -122,10 +154,12 @@ api.interceptors.request.use(
 // --- API Methods ---
 
 export const auth = {
-    register: async (userData) => {
+    register: async (userData, idempotencyKey = newIdempotencyKey()) => {
         try {
             console.log('[API] Register attempt:', { ...userData, password: '***' });
-            const response = await api.post('/register', userData);
+            const response = await withRetries(() => api.post('/register', userData, {
+                headers: { 'Idempotency-Key': idempotencyKey },
+            }));
             return response.data;
         } catch (error) {
             console.log('[API] Register error:', error.response?.data);
@@ -153,9 +187,11 @@ export const auth = {
         }
     },
 
-    resendOtp: async (email, type = 'email_verification') => {
+    resendOtp: async (email, type = 'email_verification', idempotencyKey = newIdempotencyKey()) => {
         try {
-            const response = await api.post('/resend-otp', { email, otp_type: type });
+            const response = await withRetries(() => api.post('/resend-otp', { email, otp_type: type }, {
+                headers: { 'Idempotency-Key': idempotencyKey },
+            }));
             return response.data;
         } catch (error) {
             throw error.response?.data?.detail || 'Failed to resend Code';
@@ -184,9 +220,11 @@ export const auth = {
         }
     },
 
-    googleAuth: async (idToken) => {
+    googleAuth: async (idToken, idempotencyKey = newIdempotencyKey()) => {
         try {
-            const response = await api.post('/google', { id_token: idToken });
+            const response = await withRetries(() => api.post('/google', { id_token: idToken }, {
+                headers: { 'Idempotency-Key': idempotencyKey },
+            }));
             return response.data;
         } catch (error) {
             throw error.response?.data?.detail || 'Google Auth failed';
@@ -195,7 +233,14 @@ export const auth = {
 
     getProfile: async () => {
         try {
-            const response = await api.get('/me');
+            const response = await api.get('/me', {
+                headers: profileEtag ? { 'If-None-Match': profileEtag } : {},
+                validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+            });
+            if (response.status === 304) {
+                return profileBody;
+            }
+            rememberProfile(response.headers.etag, response.data);
             return response.data;
         } catch (error) {
             throw error.response?.data?.detail || 'Failed to fetch profile';
@@ -204,14 +249,20 @@ export const auth = {
 
     updateProfile: async (profileData) => {
         try {
-            const response = await api.put('/profile', profileData);
+            const response = await api.put('/profile', profileData, {
+                headers: profileEtag ? { 'If-Match': profileEtag } : {},
+            });
+            rememberProfile(response.headers.etag, response.data);
             return response.data;
         } catch (error) {
+            if (error.response?.status === 412) {
+                rememberProfile(null, null);
+            }
             throw error.response?.data?.detail || 'Failed to update profile';
         }
     },
 
-    uploadAvatar: async (imageUri) => {
+    uploadAvatar: async (imageUri, idempotencyKey = newIdempotencyKey()) => {
         try {
             // Get the auth token
             const token = await getAuthToken();
@@ -233,14 +284,16 @@ export const auth = {
             console.log('[API] Upload - Sending to:', uploadUrl);
 
             // Use fetch API for file uploads (more reliable than axios for multipart)
-            const response = await fetch(uploadUrl, {
+            // fetch only rejects on network failure, so every rejection is retryable
+            const response = await withRetries(() => fetch(uploadUrl, {
                 method: 'POST',
                 headers: {
                     'Authorization': `Bearer ${token}`,
+                    'Idempotency-Key': idempotencyKey,
                     // Don't set Content-Type - let fetch set it with the boundary
                 },
                 body: formData,
-            });
+            }));
 
             const data = await response.json();
 
@@ -250,6 +303,7 @@ export const auth = {
             }
 
             console.log('[API] Upload success:', data);
+            rememberProfile(response.headers.get('etag'), data);
             return data;
         } catch (error) {
             console.log('[API] Upload error:', error);